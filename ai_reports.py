@@ -3,16 +3,173 @@ AI Report Generation using Databricks Foundation Models
 Generates narrative reports based on dashboard data
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncGenerator
 from databricks.sdk import WorkspaceClient
+from databricks.sdk.errors import TemporarilyUnavailable, TooManyRequests
 from databricks.sdk.service.serving import ChatMessage, ChatMessageRole
 from auth_middleware import UserContext
+import asyncio
+import hashlib
+import io
 import json
 import logging
+import os
+import random
+import re
+import threading
+import time
+import requests
+from collections import OrderedDict
 from datetime import datetime
+from types import MappingProxyType
+
+# Optional: accurate token counts when the endpoint omits usage
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on in-flight model calls per worker so bursts of report requests
+# stay under the serving endpoint's rate limit
+MAX_CONCURRENT_MODEL_CALLS = int(os.getenv("AI_MAX_CONCURRENT_CALLS", "4"))
+_model_call_semaphore = asyncio.Semaphore(MAX_CONCURRENT_MODEL_CALLS)
+
+# Requests per minute allowed to each model endpoint per worker (0 = unlimited)
+MODEL_RATE_LIMIT_RPM = int(os.getenv("AI_MODEL_RATE_LIMIT_RPM", "0"))
+
+# Retries for rate-limited or temporarily unavailable model endpoints
+MODEL_CALL_MAX_ATTEMPTS = 5
+MODEL_CALL_MAX_BACKOFF_SECONDS = 8.0
+_RETRYABLE_MODEL_ERRORS = (
+    TooManyRequests,
+    TemporarilyUnavailable,
+    TimeoutError,
+    ConnectionError,
+    # The streaming path calls the REST endpoint through requests directly
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+# How long an identical prompt reuses the previous model response
+REPORT_CACHE_TTL_SECONDS = int(os.getenv("AI_REPORT_CACHE_TTL_SECONDS", "300"))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("AI_REPORT_CACHE_MAX_ENTRIES", "256"))
+
+# Most report templates answered by a single marshaled model call; beyond this
+# per-call latency grows faster than the shared-context savings
+MAX_MARSHALED_REPORTS = 4
+
+_COMPACT_JSON_SEPARATORS = (",", ":")
+
+# Longest serialized dashboard value embedded in a prompt
+MAX_CONTEXT_VALUE_CHARS = 2_000
+
+_EXEC_SUMMARY_RE = re.compile(r"executive summary", re.IGNORECASE)
+
+_MARSHALED_SECTION_RE = re.compile(r"<<REPORT_(\d+)>>(.*?)<</REPORT_\1>>", re.S)
+
+# Report templates and prompt scaffold are built once at import
+_REPORT_TEMPLATES = MappingProxyType({
+    "churn": """Analyze member churn trends and identify:
+1. Which member segments have the highest churn rates?
+2. What are the key drivers of churn?
+3. Which regions or product lines are most affected?
+4. What recommendations would reduce churn?""",
+    
+    "performance": """Provide a comprehensive performance analysis:
+1. Overall membership growth trends
+2. Product line performance comparison
+3. Regional performance insights
+4. Key metrics that stand out (positive or concerning)
+5. Recommendations for improvement""",
+    
+    "comparative": """Compare performance across dimensions:
+1. Year-over-year trends
+2. Regional comparisons
+3. Product line comparisons
+4. Identify best and worst performing segments
+5. What explains the differences?""",
+    
+    "executive": """Create an executive summary for leadership:
+1. Top 3 key insights (brief, impactful)
+2. Critical metrics and their trends
+3. Major risks or opportunities
+4. Top 3 recommended actions
+Keep it concise and actionable.""",
+    
+    "custom": """Analyze the dashboard data and provide comprehensive insights."""
+})
+
+# The system prompt is identical on every call and is sent as its own message
+# ahead of the dashboard data so the serving endpoint can reuse its cached prefix
+_REPORT_SYSTEM_PROMPT = """You are an expert health insurance analytics analyst. Analyze the dashboard data you are given and provide insights.
+
+Please provide a comprehensive, well-structured report with:
+1. Executive Summary
+2. Key Findings
+3. Detailed Analysis
+4. Recommendations
+5. Conclusion
+
+Format the response in Markdown."""
+
+_MARSHALED_SYSTEM_PROMPT = """You are an expert health insurance analytics analyst. Analyze the dashboard data you are given and provide insights.
+
+Complete each task you are given separately. For each task provide a well-structured report with an Executive Summary, Key Findings, Recommendations and Conclusion, formatted in Markdown."""
+
+_REPORT_USER_PROMPT = """Dashboard Data:
+{context}
+
+Task:
+{prompt}"""
+
+
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter before retrying a failed model call"""
+    delay = min(MODEL_CALL_MAX_BACKOFF_SECONDS, 0.5 * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class ModelCallError(Exception):
+    """Raised when the model endpoint cannot produce a response"""
+
+
+class _RateLimiter:
+    """Token bucket spacing calls to a model endpoint under a per-minute cap"""
+    
+    def __init__(self, requests_per_minute: int):
+        self.rate = requests_per_minute / 60.0
+        # Allow bursts of up to ten seconds' worth of requests
+        self.capacity = max(1.0, self.rate * 10)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        if self.rate <= 0:
+            return
+        
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _truncate(text: str, limit: int = MAX_CONTEXT_VALUE_CHARS) -> str:
+    """Cut text to limit characters, noting how much was dropped"""
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... (+{len(text) - limit} chars omitted)"
+
 
 class ReportGenerator:
     """Generate AI-powered reports using Databricks Foundation Models"""
@@ -20,10 +177,19 @@ class ReportGenerator:
     def __init__(
         self,
         workspace_client: WorkspaceClient,
-        model_endpoint: str = "databricks-dbrx-instruct"
+        model_endpoint: str = "databricks-dbrx-instruct",
+        max_context_chars: int = 32_000,
+        rate_limit_rpm: int = MODEL_RATE_LIMIT_RPM
     ):
         self.client = workspace_client
         self.model_endpoint = model_endpoint
+        self.max_context_chars = max_context_chars
+        self._rate_limiter = _RateLimiter(rate_limit_rpm)
+        # LRU order: least recently used first
+        self._cache: "OrderedDict[str, tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._encoder = self._load_encoder()
     
     async def generate_report(
         self,
@@ -44,202 +210,532 @@ class ReportGenerator:
         Returns:
             Generated report with metadata
         """
-        start_time = datetime.utcnow()
+        start_time = time.perf_counter()
         
         try:
-            # Build context from dashboard data
-            context = self._build_context(dashboard_data)
+            full_prompt = self._build_prompt(report_type, dashboard_data, user_prompt)
             
-            # Get template prompt based on report type
-            if user_prompt:
-                prompt = user_prompt
-            else:
-                prompt = self._get_report_template(report_type)
+            # Reuse a previous response for an identical prompt
+            cache_key = self._cache_key(report_type, full_prompt)
+            response = self._get_cached(cache_key)
+            cache_hit = response is not None
             
-            # Combine context and prompt
-            full_prompt = f"""You are an expert health insurance analytics analyst. Analyze the following dashboard data and provide insights.
-
-Dashboard Data:
-{context}
-
-Task:
-{prompt}
-
-Please provide a comprehensive, well-structured report with:
-1. Executive Summary
-2. Key Findings
-3. Detailed Analysis
-4. Recommendations
-5. Conclusion
-
-Format the response in Markdown."""
-            
-            # Call Databricks Foundation Model
-            response = self._call_model(full_prompt)
+            if not cache_hit:
+                # Call Databricks Foundation Model
+                response = await self._call_model(full_prompt)
+                self._set_cached(cache_key, response)
             
             # Calculate metrics
-            generation_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+            generation_time = (time.perf_counter() - start_time) * 1000
+            
+            logger.info("Report generated", extra={'context': {
+                'report_type': report_type,
+                'model': self.model_endpoint,
+                'cache_hit': cache_hit,
+                'generation_time_ms': int(generation_time)
+            }})
             
             return {
                 "success": True,
                 "report": response["content"],
                 "report_type": report_type,
                 "generation_time_ms": int(generation_time),
-                "tokens_used": response.get("tokens_used", 0),
+                "tokens_used": 0 if cache_hit else response.get("tokens_used", 0),
+                "cache_hit": cache_hit,
                 "model": self.model_endpoint,
                 "generated_at": datetime.utcnow().isoformat(),
                 "user_email": user_context.email if user_context else "unknown"
             }
             
         except Exception as e:
-            logger.error(f"Report generation failed: {str(e)}")
+            logger.error("Report generation failed", exc_info=True, extra={'context': {
+                'report_type': report_type,
+                'model': self.model_endpoint
+            }})
             return {
                 "success": False,
                 "error": str(e),
                 "report_type": report_type,
-                "generation_time_ms": int((datetime.utcnow() - start_time).total_seconds() * 1000)
+                "generation_time_ms": int((time.perf_counter() - start_time) * 1000)
             }
     
+    async def stream_report(
+        self,
+        report_type: str,
+        dashboard_data: Dict[str, Any],
+        user_prompt: Optional[str] = None,
+        user_context: Optional[UserContext] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Generate an AI report, yielding Markdown chunks as the model produces them
+        
+        Args:
+            report_type: Type of report (see generate_report)
+            dashboard_data: Dashboard data to analyze
+            user_prompt: Optional custom prompt from user
+            user_context: User making the request
+        
+        Yields:
+            Report text fragments; the full text is cached like generate_report
+        """
+        full_prompt = self._build_prompt(report_type, dashboard_data, user_prompt)
+        
+        cache_key = self._cache_key(report_type, full_prompt)
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            yield cached["content"]
+            return
+        
+        chunks = []
+        await self._rate_limiter.acquire()
+        async with _model_call_semaphore:
+            response = await self._open_model_stream_with_retry(full_prompt)
+            try:
+                lines = response.iter_lines(decode_unicode=True)
+                while True:
+                    line = await asyncio.to_thread(next, lines, None)
+                    if line is None:
+                        break
+                    
+                    # Server-sent events: "data: {...}" per chunk, "data: [DONE]" at the end
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    
+                    choices = json.loads(payload).get("choices") or []
+                    delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                    if delta:
+                        chunks.append(delta)
+                        yield delta
+            finally:
+                response.close()
+        
+        self._set_cached(cache_key, {"content": "".join(chunks), "tokens_used": 0})
+        logger.info("Report streamed", extra={'context': {
+            'report_type': report_type,
+            'model': self.model_endpoint,
+            'user_email': user_context.email if user_context else "unknown"
+        }})
+    
+    async def _open_model_stream_with_retry(self, prompt: str) -> requests.Response:
+        """Open the model stream, retrying connection failures and timeouts like _call_model"""
+        for attempt in range(1, MODEL_CALL_MAX_ATTEMPTS + 1):
+            try:
+                return await asyncio.to_thread(self._open_model_stream, prompt)
+            except _RETRYABLE_MODEL_ERRORS as e:
+                if attempt == MODEL_CALL_MAX_ATTEMPTS:
+                    raise ModelCallError(
+                        f"Model endpoint {self.model_endpoint} unavailable after {attempt} attempts: {str(e)}"
+                    ) from e
+                delay = _retry_delay(attempt)
+                logger.warning("Model stream failed to open, retrying", extra={'context': {
+                    'model': self.model_endpoint,
+                    'attempt': attempt,
+                    'retry_in_seconds': round(delay, 2),
+                    'error': type(e).__name__
+                }})
+                await asyncio.sleep(delay)
+    
+    def _open_model_stream(self, prompt: str) -> requests.Response:
+        """
+        Open a streaming chat completion against the serving endpoint
+        
+        The SDK's serving_endpoints.query buffers the whole completion, so the
+        invocations REST endpoint is called directly with the SDK's auth headers.
+        """
+        config = self.client.config
+        response = requests.post(
+            f"{config.host.rstrip('/')}/serving-endpoints/{self.model_endpoint}/invocations",
+            headers=config.authenticate(),
+            json={
+                "messages": [
+                    {"role": "system", "content": _REPORT_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.7,
+                "max_tokens": 2000,
+                "stream": True
+            },
+            stream=True,
+            timeout=120
+        )
+        # Surface throttling as the SDK's errors so the retry loop handles it,
+        # and release the pooled connection on any failed status
+        if response.status_code in (429, 503):
+            response.close()
+            error_cls = TooManyRequests if response.status_code == 429 else TemporarilyUnavailable
+            raise error_cls(f"Model endpoint returned HTTP {response.status_code}")
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            response.close()
+            raise
+        return response
+    
+    async def generate_reports_batch(
+        self,
+        specs: List[Dict[str, Any]],
+        user_context: Optional[UserContext] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate several AI reports concurrently
+        
+        Args:
+            specs: One dict per report with 'report_type', 'dashboard_data'
+                and optional 'user_prompt'
+            user_context: User making the request
+        
+        Returns:
+            Generated reports in the same order as specs; a failed report
+            does not affect the others
+        """
+        # Model calls are bounded by the module-level semaphore, so all
+        # reports can be scheduled at once
+        results = await asyncio.gather(
+            *[
+                self.generate_report(
+                    report_type=spec.get("report_type", "custom"),
+                    dashboard_data=spec.get("dashboard_data", {}),
+                    user_prompt=spec.get("user_prompt"),
+                    user_context=user_context
+                )
+                for spec in specs
+            ],
+            return_exceptions=True
+        )
+        
+        return [
+            result if not isinstance(result, BaseException) else {
+                "success": False,
+                "error": str(result),
+                "report_type": spec.get("report_type", "custom")
+            }
+            for spec, result in zip(specs, results)
+        ]
+    
+    async def generate_reports_marshaled(
+        self,
+        report_types: List[str],
+        dashboard_data: Dict[str, Any],
+        user_context: Optional[UserContext] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate several report types for the same dashboard in one model call
+        
+        The dashboard context is sent once and the model answers every task
+        in a delimited section, so input tokens do not grow with the number
+        of reports. Falls back to concurrent calls above MAX_MARSHALED_REPORTS.
+        
+        Args:
+            report_types: Report types to generate (see generate_report)
+            dashboard_data: Dashboard data to analyze
+            user_context: User making the request
+        
+        Returns:
+            Dict with per-report results keyed by report type
+        """
+        if len(report_types) > MAX_MARSHALED_REPORTS:
+            results = await self.generate_reports_batch(
+                [{"report_type": rt, "dashboard_data": dashboard_data} for rt in report_types],
+                user_context=user_context
+            )
+            return {
+                "success": all(r.get("success") for r in results),
+                "reports": dict(zip(report_types, results))
+            }
+        
+        start_time = time.perf_counter()
+        
+        try:
+            context = self._build_context(dashboard_data)
+            
+            tasks = "\n\n".join(
+                f"## Task {i}: {report_type}\n"
+                f"{self._get_report_template(report_type)}\n"
+                f"Respond between <<REPORT_{i}>> and <</REPORT_{i}>>"
+                for i, report_type in enumerate(report_types)
+            )
+            
+            full_prompt = f"Dashboard Data:\n{context}\n\nTasks:\n\n{tasks}"
+            
+            response = await self._call_model(full_prompt, system_prompt=_MARSHALED_SYSTEM_PROMPT)
+            
+            sections = {
+                int(m.group(1)): m.group(2).strip()
+                for m in _MARSHALED_SECTION_RE.finditer(response["content"])
+            }
+            
+            generation_time_ms = int((time.perf_counter() - start_time) * 1000)
+            generated_at = datetime.utcnow().isoformat()
+            
+            reports = {}
+            for i, report_type in enumerate(report_types):
+                if i in sections:
+                    reports[report_type] = {
+                        "success": True,
+                        "report": sections[i],
+                        "report_type": report_type,
+                        "generated_at": generated_at
+                    }
+                else:
+                    reports[report_type] = {
+                        "success": False,
+                        "error": "Model response did not contain this report",
+                        "report_type": report_type
+                    }
+            
+            return {
+                "success": all(r["success"] for r in reports.values()),
+                "reports": reports,
+                "generation_time_ms": generation_time_ms,
+                "tokens_used": response.get("tokens_used", 0),
+                "model": self.model_endpoint,
+                "user_email": user_context.email if user_context else "unknown"
+            }
+            
+        except Exception as e:
+            logger.error("Marshaled report generation failed", exc_info=True, extra={'context': {
+                'report_types': report_types,
+                'model': self.model_endpoint
+            }})
+            return {
+                "success": False,
+                "error": str(e),
+                "report_types": report_types,
+                "generation_time_ms": int((time.perf_counter() - start_time) * 1000)
+            }
+    
+    @staticmethod
+    def _load_encoder():
+        """Load a BPE tokenizer for token accounting, if tiktoken is installed"""
+        if tiktoken is None:
+            return None
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            logger.warning("Tokenizer unavailable, using approximate token counts", exc_info=True)
+            return None
+    
+    def _count_tokens(self, text: str) -> int:
+        """Count tokens when the endpoint does not report usage"""
+        if self._encoder is not None:
+            return len(self._encoder.encode(text))
+        # ~4 characters per token is the usual approximation for English/JSON
+        return len(text) // 4
+    
+    def _build_prompt(
+        self,
+        report_type: str,
+        dashboard_data: Dict[str, Any],
+        user_prompt: Optional[str] = None
+    ) -> str:
+        """Build the full model prompt for a report"""
+        # Build context from dashboard data
+        context = self._build_context(dashboard_data)
+        
+        # Get template prompt based on report type
+        if user_prompt:
+            prompt = user_prompt
+        else:
+            prompt = self._get_report_template(report_type)
+        
+        # Combine context and prompt
+        return _REPORT_USER_PROMPT.format(context=context, prompt=prompt)
+    
+    def _cache_key(self, report_type: str, full_prompt: str) -> str:
+        """Content-addressed key for a prompt sent to this model endpoint"""
+        raw = f"{report_type}|{self.model_endpoint}|{full_prompt}".encode()
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+    
+    def _get_cached(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get cached model response if still valid"""
+        if key in self._cache:
+            value, cached_at = self._cache[key]
+            if time.monotonic() - cached_at < REPORT_CACHE_TTL_SECONDS:
+                self._cache.move_to_end(key)
+                self._cache_hits += 1
+                return value
+            else:
+                del self._cache[key]
+        self._cache_misses += 1
+        return None
+    
+    def _set_cached(self, key: str, value: Dict[str, Any]):
+        """Cache a model response, evicting the least recently used beyond the size bound"""
+        self._cache[key] = (value, time.monotonic())
+        self._cache.move_to_end(key)
+        while len(self._cache) > REPORT_CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """Response cache hit/miss counters and current size"""
+        return {
+            "hits": self._cache_hits,
+            "misses": self._cache_misses,
+            "size": len(self._cache),
+            "max_size": REPORT_CACHE_MAX_ENTRIES
+        }
+    
     def _build_context(self, dashboard_data: Dict[str, Any]) -> str:
-        """Build context string from dashboard data"""
-        context_parts = []
+        """
+        Build context string from dashboard data
+        
+        Values are serialized as compact JSON; indentation only adds tokens
+        the model has to read and we have to pay for. Each value is capped at
+        MAX_CONTEXT_VALUE_CHARS and the whole context at max_context_chars so
+        input size (and with it cost and time-to-first-token) stays bounded.
+        """
+        buf = io.StringIO()
         
         for key, value in dashboard_data.items():
+            title = key.replace('_', ' ').title()
+            
+            if buf.tell() >= self.max_context_chars:
+                # Out of budget: mention the section without its data
+                size = f"{len(value)} items" if isinstance(value, (list, dict)) else "value"
+                buf.write(f"\n## {title}: <{size} omitted>\n")
+                continue
+            
             if isinstance(value, list) and len(value) > 0:
                 # Summarize list data
-                context_parts.append(f"\n## {key.replace('_', ' ').title()}")
-                context_parts.append(f"Total records: {len(value)}")
+                buf.write(f"\n## {title}\n")
+                buf.write(f"Total records: {len(value)}\n")
                 
-                # Add sample data
-                if len(value) <= 5:
-                    context_parts.append(json.dumps(value, indent=2))
-                else:
-                    context_parts.append("Sample data:")
-                    context_parts.append(json.dumps(value[:5], indent=2))
+                # Add sample data (slice before serializing the discarded tail)
+                if len(value) > 5:
+                    buf.write("Sample data:\n")
+                buf.write(_truncate(json.dumps(value[:5], separators=_COMPACT_JSON_SEPARATORS)))
+                buf.write("\n")
             
             elif isinstance(value, dict):
-                context_parts.append(f"\n## {key.replace('_', ' ').title()}")
-                context_parts.append(json.dumps(value, indent=2))
+                buf.write(f"\n## {title}\n")
+                buf.write(_truncate(json.dumps(value, separators=_COMPACT_JSON_SEPARATORS)))
+                buf.write("\n")
             
             else:
-                context_parts.append(f"{key}: {value}")
+                buf.write(f"{key}: {_truncate(str(value))}\n")
         
-        return "\n".join(context_parts)
+        return buf.getvalue().rstrip("\n")
     
     def _get_report_template(self, report_type: str) -> str:
         """Get report template based on type"""
-        templates = {
-            "churn": """Analyze member churn trends and identify:
-1. Which member segments have the highest churn rates?
-2. What are the key drivers of churn?
-3. Which regions or product lines are most affected?
-4. What recommendations would reduce churn?""",
-            
-            "performance": """Provide a comprehensive performance analysis:
-1. Overall membership growth trends
-2. Product line performance comparison
-3. Regional performance insights
-4. Key metrics that stand out (positive or concerning)
-5. Recommendations for improvement""",
-            
-            "comparative": """Compare performance across dimensions:
-1. Year-over-year trends
-2. Regional comparisons
-3. Product line comparisons
-4. Identify best and worst performing segments
-5. What explains the differences?""",
-            
-            "executive": """Create an executive summary for leadership:
-1. Top 3 key insights (brief, impactful)
-2. Critical metrics and their trends
-3. Major risks or opportunities
-4. Top 3 recommended actions
-Keep it concise and actionable.""",
-            
-            "custom": """Analyze the dashboard data and provide comprehensive insights."""
-        }
-        
-        return templates.get(report_type, templates["custom"])
+        return _REPORT_TEMPLATES.get(report_type, _REPORT_TEMPLATES["custom"])
     
-    def _call_model(self, prompt: str) -> Dict[str, Any]:
+    async def _call_model(
+        self,
+        prompt: str,
+        system_prompt: str = _REPORT_SYSTEM_PROMPT
+    ) -> Dict[str, Any]:
         """
         Call Databricks Foundation Model endpoint
         
+        The SDK client is synchronous, so the HTTP round-trip runs in a worker
+        thread to keep the event loop free while the model generates.
+        Rate-limit and transient availability errors are retried with
+        exponential backoff and jitter.
+        
         Args:
-            prompt: The prompt to send to the model
+            prompt: The per-request prompt to send to the model
+            system_prompt: Static instructions sent ahead of the prompt
         
         Returns:
             Model response with content and metadata
+        
+        Raises:
+            ModelCallError if the endpoint fails or all retries are exhausted
         """
-        try:
-            # Use Databricks SDK to call Foundation Model
-            response = self.client.serving_endpoints.query(
-                name=self.model_endpoint,
-                messages=[
-                    ChatMessage(
-                        role=ChatMessageRole.USER,
-                        content=prompt
+        for attempt in range(1, MODEL_CALL_MAX_ATTEMPTS + 1):
+            try:
+                await self._rate_limiter.acquire()
+                
+                # Use Databricks SDK to call Foundation Model
+                async with _model_call_semaphore:
+                    response = await asyncio.to_thread(
+                        self.client.serving_endpoints.query,
+                        name=self.model_endpoint,
+                        messages=[
+                            ChatMessage(
+                                role=ChatMessageRole.SYSTEM,
+                                content=system_prompt
+                            ),
+                            ChatMessage(
+                                role=ChatMessageRole.USER,
+                                content=prompt
+                            )
+                        ],
+                        temperature=0.7,
+                        max_tokens=2000
                     )
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
+                break
             
-            # Extract response content
-            if response.choices and len(response.choices) > 0:
-                content = response.choices[0].message.content
-                
-                # Count tokens (approximate if not provided)
-                tokens_used = response.usage.total_tokens if response.usage else len(prompt.split()) + len(content.split())
-                
-                return {
-                    "content": content,
-                    "tokens_used": tokens_used
-                }
-            else:
-                raise Exception("No response from model")
+            except _RETRYABLE_MODEL_ERRORS as e:
+                if attempt == MODEL_CALL_MAX_ATTEMPTS:
+                    logger.error("Model call failed after retries", exc_info=True, extra={'context': {
+                        'model': self.model_endpoint,
+                        'attempts': attempt
+                    }})
+                    raise ModelCallError(
+                        f"Model endpoint {self.model_endpoint} unavailable after {attempt} attempts: {str(e)}"
+                    ) from e
                 
-        except Exception as e:
-            logger.error(f"Model call failed: {str(e)}")
-            # Fallback to a simple response if model fails
-            return {
-                "content": f"Error generating report: {str(e)}",
-                "tokens_used": 0
-            }
+                delay = _retry_delay(attempt)
+                logger.warning("Model call failed, retrying", extra={'context': {
+                    'model': self.model_endpoint,
+                    'attempt': attempt,
+                    'retry_in_seconds': round(delay, 2),
+                    'error': type(e).__name__
+                }})
+                await asyncio.sleep(delay)
+            
+            except Exception as e:
+                logger.error("Model call failed", exc_info=True, extra={'context': {
+                    'model': self.model_endpoint
+                }})
+                raise ModelCallError(f"Model call failed: {str(e)}") from e
+        
+        # Extract response content
+        if not response.choices:
+            raise ModelCallError("No response from model")
+        
+        content = response.choices[0].message.content
+        
+        # Count tokens (approximate if not provided)
+        tokens_used = response.usage.total_tokens if response.usage else self._count_tokens(system_prompt) + self._count_tokens(prompt) + self._count_tokens(content)
+        
+        return {
+            "content": content,
+            "tokens_used": tokens_used
+        }
     
     def generate_report_summary(self, full_report: str, max_length: int = 500) -> str:
         """Generate a brief summary of a longer report"""
-        # Simple extraction of first paragraph or executive summary
-        lines = full_report.split('\n')
-        summary = []
-        char_count = 0
-        
-        for line in lines:
-            if 'executive summary' in line.lower():
-                # Start capturing from executive summary
-                summary = [line]
-                continue
-            
-            if summary or char_count < max_length:
-                summary.append(line)
-                char_count += len(line)
-                
-                if char_count >= max_length:
-                    break
+        # Start from the executive summary heading if present, else the top
+        match = _EXEC_SUMMARY_RE.search(full_report)
+        start = full_report.rfind('\n', 0, match.start()) + 1 if match else 0
         
-        return '\n'.join(summary[:5])  # First 5 lines max
+        snippet = full_report[start:start + max_length]
+        return '\n'.join(snippet.split('\n', 5)[:5])  # First 5 lines max
 
 
-# Global report generator instance
-_report_generator: Optional[ReportGenerator] = None
+# Report generator instances, one per model endpoint
+_report_generators: Dict[str, ReportGenerator] = {}
+_report_generators_lock = threading.Lock()
 
 
 def get_report_generator(
     workspace_client: WorkspaceClient,
     model_endpoint: str = "databricks-dbrx-instruct"
 ) -> ReportGenerator:
-    """Get or create global report generator instance"""
-    global _report_generator
-    if _report_generator is None:
-        _report_generator = ReportGenerator(workspace_client, model_endpoint)
-    return _report_generator
+    """Get or create the report generator for a model endpoint"""
+    generator = _report_generators.get(model_endpoint)
+    if generator is not None:
+        return generator
+    
+    with _report_generators_lock:
+        generator = _report_generators.get(model_endpoint)
+        if generator is None:
+            generator = ReportGenerator(workspace_client, model_endpoint)
+            _report_generators[model_endpoint] = generator
+    return generator
@@ -4,22 +4,38 @@ Enterprise-grade analytics platform with on-behalf-of auth, Genie, AI reports, a
 Based on: https://www.databricks.com/blog/building-databricks-apps-react-and-mosaic-ai-agents-enterprise-chat-solutions
 """
 
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional, AsyncGenerator
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, field_validator
+from typing import Annotated, List, Dict, Any, Optional, AsyncGenerator
+import asyncio
+import csv
+import hashlib
+import io
+import orjson
 import os
+import requests
+import sqlglot
+import threading
 import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache, partial
+from cachetools import TTLCache
 from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.sql import StatementState
+from databricks.sdk.service.sql import Disposition, Format, StatementState
+from sqlglot import exp
+from sqlglot.errors import ParseError
 
 # Setup logging FIRST before other imports
 from logging_config import setup_logging, get_logger, LogTimer
 setup_logging()  # Auto-detects environment and configures logging
 
 # Import new modules
-from auth_middleware import get_user_context, get_admin_user, UserContext
+from auth_middleware import get_user_context, get_admin_user, resolve_user_groups, UserContext
 from permissions_service import get_permissions_service, check_query_permissions
 from config_service import get_config_service
 from genie_integration import get_genie_service
@@ -34,18 +50,19 @@ query_logger = get_logger('query')
 try:
     from config_manager import get_config as get_old_config
     old_config_available = True
-except:
+except ImportError:
     old_config_available = False
 
 # Initialize FastAPI apps
-api_app = FastAPI(title="Health Dashboard API")
-app = FastAPI(title="Health Insurance Dashboard")
+# orjson serializes the row-heavy responses much faster than stdlib json
+api_app = FastAPI(title="Health Dashboard API", default_response_class=ORJSONResponse)
+app = FastAPI(title="Health Insurance Dashboard", default_response_class=ORJSONResponse)
 
 # Add request logging middleware
 @api_app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Log all API requests with timing"""
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     # Log incoming request
     api_logger.debug(f"Incoming request: {request.method} {request.url.path}")
@@ -54,7 +71,7 @@ async def log_requests(request: Request, call_next):
     response = await call_next(request)
     
     # Calculate duration
-    duration_ms = (time.time() - start_time) * 1000
+    duration_ms = (time.perf_counter() - start_time) * 1000
     
     # Get user email if available (from auth header)
     user_email = request.headers.get('X-User-Email', None)
@@ -78,6 +95,57 @@ CONFIG_CATALOG = os.getenv("CONFIG_CATALOG", "mv_catalog")
 CONFIG_SCHEMA = os.getenv("CONFIG_SCHEMA", "config_schema")
 GENIE_SPACE_ID = os.getenv("GENIE_SPACE_ID", "")
 AI_MODEL_ENDPOINT = os.getenv("AI_MODEL_ENDPOINT", "databricks-dbrx-instruct")
+SQL_MAX_CONCURRENCY = int(os.getenv("SQL_MAX_CONCURRENCY", "16"))
+QUERY_MAX_STAR_LIMIT = int(os.getenv("QUERY_MAX_STAR_LIMIT", "10000"))
+
+# Worker threads for blocking SDK statement execution
+_sql_executor = ThreadPoolExecutor(max_workers=SQL_MAX_CONCURRENCY, thread_name_prefix="sql")
+
+# Worker threads for other blocking SDK and config service calls
+SDK_MAX_CONCURRENCY = int(os.getenv("SDK_MAX_CONCURRENCY", "32"))
+_sdk_executor = ThreadPoolExecutor(max_workers=SDK_MAX_CONCURRENCY, thread_name_prefix="sdk")
+
+# Server-side wait on submit (0s or 5s-50s); longer statements are polled
+SQL_SUBMIT_WAIT_TIMEOUT = "5s"
+SQL_POLL_INITIAL_DELAY_SECONDS = 0.1
+SQL_POLL_MAX_DELAY_SECONDS = 2.0
+
+# Rows serialized per chunk written by /query/stream and the CSV fallback
+QUERY_STREAM_BATCH_ROWS = 1000
+
+# /query returns Arrow IPC instead of JSON when the client accepts it
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+EXTERNAL_LINK_TIMEOUT_SECONDS = 60
+# Bytes read from a presigned result chunk per yield, bounding per-client buffering
+EXTERNAL_LINK_READ_BYTES = 1024 * 1024
+
+# In-process result caches for the fixed dashboard queries
+VIEW_CACHE_TTL_SECONDS = int(os.getenv("VIEW_CACHE_TTL_SECONDS", "60"))
+FILTER_OPTIONS_CACHE_TTL_SECONDS = int(os.getenv("FILTER_OPTIONS_CACHE_TTL_SECONDS", "300"))
+VIEW_CACHE_CONTROL = "max-age=30"
+_view_cache: TTLCache = TTLCache(maxsize=256, ttl=VIEW_CACHE_TTL_SECONDS)
+_filter_options_cache: TTLCache = TTLCache(maxsize=256, ttl=FILTER_OPTIONS_CACHE_TTL_SECONDS)
+
+# Unity Catalog browser responses, per user; one lookup per key runs at a time
+CATALOG_CACHE_TTL_SECONDS = int(os.getenv("CATALOG_CACHE_TTL_SECONDS", "60"))
+_catalog_cache: TTLCache = TTLCache(maxsize=5000, ttl=CATALOG_CACHE_TTL_SECONDS)
+# Catalog listings are per-user, so browsers may cache them but shared proxies may not
+CATALOG_CACHE_CONTROL = "private, max-age=60, stale-while-revalidate=300"
+# Loads in progress per key; concurrent misses await the same future
+_catalog_inflight: Dict[tuple, asyncio.Future] = {}
+
+# Full-response cache for the AI dashboard and visualization endpoints
+AI_RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("AI_RESPONSE_CACHE_TTL_SECONDS", "600"))
+_ai_response_cache: TTLCache = TTLCache(maxsize=1024, ttl=AI_RESPONSE_CACHE_TTL_SECONDS)
+
+# Refresh-ahead for hot view queries; disabled unless HOT_QUERY_REFRESH_SECONDS > 0
+# since every refresh runs on the warehouse and keeps it from auto-stopping
+HOT_QUERY_THRESHOLD = int(os.getenv("HOT_QUERY_THRESHOLD", "10"))
+HOT_QUERY_REFRESH_SECONDS = int(os.getenv("HOT_QUERY_REFRESH_SECONDS", "0"))
+HOT_QUERY_IDLE_SECONDS = int(os.getenv("HOT_QUERY_IDLE_SECONDS", "600"))
+_hot_query_counts: Dict[str, int] = {}
+_hot_query_last_seen: Dict[str, float] = {}
+_hot_query_refreshers: Dict[str, asyncio.Task] = {}
 
 # Load old YAML config if available (for backward compatibility during migration)
 data_config = None
@@ -93,6 +161,14 @@ DATABRICKS_SERVER_HOSTNAME = os.getenv("DATABRICKS_SERVER_HOSTNAME", "")
 DATABRICKS_HTTP_PATH = os.getenv("DATABRICKS_HTTP_PATH", "")
 DATABRICKS_HOST = os.getenv("DATABRICKS_HOST", "") or f"https://{DATABRICKS_SERVER_HOSTNAME}"
 DATABRICKS_TOKEN = os.getenv("DATABRICKS_TOKEN", "")
+DATABRICKS_CLIENT_ID = os.getenv("DATABRICKS_CLIENT_ID", "")
+DATABRICKS_CLIENT_SECRET = os.getenv("DATABRICKS_CLIENT_SECRET", "")
+
+# Workspace URL handed to the SDK, normalized once at startup
+_raw_host = os.getenv("DATABRICKS_HOST")
+WORKSPACE_HOST_URL = f"https://{_raw_host}" if _raw_host and not _raw_host.startswith("https://") else _raw_host
+DEBUG_TRACEBACK = os.getenv("DEBUG_TRACEBACK", "") == "1"
+AUTH_METHOD = "OAuth M2M" if DATABRICKS_CLIENT_ID else "Token (if set)" if DATABRICKS_TOKEN else "None detected"
 
 # Log configuration
 logger.info(f"Application configuration loaded", extra={
@@ -106,10 +182,86 @@ logger.info(f"Application configuration loaded", extra={
 })
 
 
+@lru_cache(maxsize=512)
+def _unbounded_select_error(sql: str) -> Optional[str]:
+    """
+    Reject client SQL that selects every column without a bounded LIMIT
+    
+    The statement is parsed rather than pattern-matched, and results are
+    memoized per SQL string. Statements that don't parse, aggregates, and
+    non-SELECT commands are left for the warehouse to handle.
+    """
+    try:
+        parsed = sqlglot.parse_one(sql, dialect="databricks")
+    except ParseError:
+        return None
+    
+    parsed = _unwrap_query(parsed)
+    if parsed is None:
+        return None
+    
+    if isinstance(parsed, exp.Union):
+        # UNION / INTERSECT / EXCEPT: a bounded LIMIT on the whole set
+        # operation covers it, otherwise every operand must pass on its own
+        if _has_bounded_limit(parsed):
+            return None
+        operands = [parsed.left, parsed.right]
+        while operands:
+            node = _unwrap_query(operands.pop())
+            if isinstance(node, exp.Union):
+                if not _has_bounded_limit(node):
+                    operands.extend((node.left, node.right))
+            elif isinstance(node, exp.Select) and _is_unbounded_star_select(node):
+                return f"SELECT * queries require LIMIT <= {QUERY_MAX_STAR_LIMIT}"
+        return None
+    
+    if isinstance(parsed, exp.Select) and _is_unbounded_star_select(parsed):
+        return f"SELECT * queries require LIMIT <= {QUERY_MAX_STAR_LIMIT}"
+    return None
+
+
+def _unwrap_query(node: exp.Expression) -> Optional[exp.Expression]:
+    """
+    Strip parentheses and subquery wrappers around a query
+    
+    Returns None when a wrapper carries its own bounded LIMIT, as in
+    "(SELECT * FROM t) LIMIT 5", since that already bounds the result.
+    """
+    while isinstance(node, (exp.Subquery, exp.Paren)):
+        if _has_bounded_limit(node):
+            return None
+        node = node.this
+    return node
+
+
+def _has_bounded_limit(node: exp.Expression) -> bool:
+    """Whether the node has a literal LIMIT no larger than QUERY_MAX_STAR_LIMIT"""
+    limit = node.args.get("limit")
+    value = limit.expression if limit is not None else None
+    return isinstance(value, exp.Literal) and value.is_int and int(value.name) <= QUERY_MAX_STAR_LIMIT
+
+
+def _is_unbounded_star_select(select: exp.Select) -> bool:
+    """A non-aggregate SELECT * without a bounded LIMIT"""
+    if select.args.get("group"):
+        return False
+    if not any(projection.is_star for projection in select.expressions):
+        return False
+    return not _has_bounded_limit(select)
+
+
 # Pydantic models for API requests/responses
 class QueryRequest(BaseModel):
     sql: str
     warehouse_id: Optional[str] = None
+    
+    @field_validator("sql")
+    @classmethod
+    def check_row_limit(cls, sql: str) -> str:
+        error = _unbounded_select_error(sql)
+        if error:
+            raise ValueError(error)
+        return sql
 
 
 class QueryResponse(BaseModel):
@@ -119,20 +271,98 @@ class QueryResponse(BaseModel):
 
 
 # Dependency to get Databricks client
+@lru_cache(maxsize=1)
 def get_databricks_client() -> WorkspaceClient:
-    """Create and return a Databricks workspace client"""
+    """
+    Return the shared Databricks workspace client
+    
+    Built once per worker so auth resolution and the HTTP connection pool
+    are reused across requests instead of being set up on every call.
+    """
     # When running in Databricks Apps, the SDK auto-detects:
     # - DATABRICKS_HOST (or DATABRICKS_SERVER_HOSTNAME)
     # - DATABRICKS_CLIENT_ID
     # - DATABRICKS_CLIENT_SECRET
     # These are automatically provided by Databricks Apps runtime
     
-    # Ensure host has proper format
-    host = os.getenv("DATABRICKS_HOST")
-    if host and not host.startswith("https://"):
-        host = f"https://{host}"
+    return WorkspaceClient(host=WORKSPACE_HOST_URL)
+
+
+async def _run_sdk(fn, *args, **kwargs):
+    """Run a blocking SDK (or SDK-backed service) call without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_sdk_executor, partial(fn, *args, **kwargs))
+
+
+async def _exec_sql(
+    client: WorkspaceClient,
+    sql: str,
+    warehouse_id: Optional[str] = None,
+    wait_timeout: str = "30s",
+    **options
+):
+    """
+    Execute a SQL statement on the warehouse without blocking the event loop
+    
+    The statement is submitted with a short server-side wait so quick queries
+    complete in one round-trip; slower ones are polled with backoff from the
+    event loop, so a worker thread is never held for the whole query. Statements
+    still running after wait_timeout are cancelled and returned in their last
+    (non-SUCCEEDED) state. Extra options (format, disposition, ...) are passed
+    through to execute_statement.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + int(wait_timeout.rstrip("s"))
     
-    return WorkspaceClient(host=host)
+    response = await loop.run_in_executor(
+        _sql_executor,
+        partial(
+            client.statement_execution.execute_statement,
+            warehouse_id=warehouse_id or SQL_WAREHOUSE_ID,
+            statement=sql,
+            catalog=CATALOG_NAME,
+            schema=SCHEMA_NAME,
+            wait_timeout=SQL_SUBMIT_WAIT_TIMEOUT,
+            **options
+        )
+    )
+    
+    delay = SQL_POLL_INITIAL_DELAY_SECONDS
+    while response.status.state in (StatementState.PENDING, StatementState.RUNNING):
+        if loop.time() >= deadline:
+            query_logger.warning("Statement timed out, cancelling", extra={'context': {
+                'statement_id': response.statement_id,
+                'wait_timeout': wait_timeout
+            }})
+            await loop.run_in_executor(
+                _sql_executor,
+                client.statement_execution.cancel_execution,
+                response.statement_id
+            )
+            break
+        
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, SQL_POLL_MAX_DELAY_SECONDS)
+        response = await loop.run_in_executor(
+            _sql_executor,
+            client.statement_execution.get_statement,
+            response.statement_id
+        )
+    
+    return response
+
+
+def _result_columns(response) -> tuple:
+    """Column names from a statement response's manifest, computed once per result"""
+    return tuple(col.name for col in response.manifest.schema.columns) if response.manifest else ()
+
+
+# Fixed output columns of the debug queries, in SELECT order
+_SHOW_TABLES_COLUMNS = ("database", "table_name", "is_temporary")
+_MEMBERSHIP_TREND_COLUMNS = (
+    "month_start", "active_members", "new_enrollments",
+    "terminations", "avg_risk_score", "avg_pmpm"
+)
 
 
 @api_app.get("/health")
@@ -149,13 +379,12 @@ async def health_check():
             "catalog": CATALOG_NAME,
             "schema": SCHEMA_NAME,
         },
-        "timestamp": str(os.popen('date').read().strip())
+        "timestamp": datetime.utcnow().isoformat() + "Z"
     }
 
 
-@api_app.get("/config/summary")
-async def get_config_summary():
-    """Get current configuration summary"""
+def _config_summary() -> Dict[str, Any]:
+    """Build the configuration summary payload"""
     if not data_config:
         return {
             "status": "warning",
@@ -181,9 +410,70 @@ async def get_config_summary():
     }
 
 
+@api_app.get("/config/summary")
+async def get_config_summary(request: Request):
+    """Get current configuration summary"""
+    return _conditional_response(request, orjson.dumps(_config_summary()))
+
+
+async def _load_dynamic_filter(
+    client: WorkspaceClient,
+    filter_name: str,
+    filter_details: Dict[str, Any],
+    nocache: bool = False
+) -> Dict[str, Any]:
+    """Query distinct values for one dynamic filter, using the options cache"""
+    cache_key = (data_config.catalog, data_config.schema, filter_name)
+    if not nocache and cache_key in _filter_options_cache:
+        logger.debug(f"Loaded dynamic filter from cache: {filter_name}")
+        return _filter_options_cache[cache_key]
+    
+    entry = {
+        "label": filter_details.get('label', filter_name),
+        "values": [],
+        "default": filter_details.get('default', 'all')
+    }
+    
+    try:
+        view_key = filter_details.get('query_view')
+        field = filter_details.get('query_field')
+        mapped_field = data_config.map_field(view_key, field)
+        
+        sql = f"""
+            SELECT DISTINCT {mapped_field} as {field}
+            FROM {data_config.get_full_table_name(view_key)}
+            WHERE {mapped_field} IS NOT NULL
+            ORDER BY {mapped_field}
+        """
+        
+        with LogTimer(query_logger, f"Dynamic filter query: {filter_name}", filter=filter_name, field=mapped_field):
+            response = await _exec_sql(client, sql)
+        
+        if response.status.state == StatementState.SUCCEEDED:
+            if response.result and response.result.data_array:
+                entry["values"] = [row[0] for row in response.result.data_array if row[0]]
+            _filter_options_cache[cache_key] = entry
+            logger.info(f"Loaded dynamic filter: {filter_name} ({len(entry['values'])} values)")
+        else:
+            logger.warning(f"Dynamic filter query failed: {filter_name}", extra={'context': {'state': response.status.state}})
+    except Exception as e:
+        logger.error(f"Failed to load dynamic filter: {filter_name}", exc_info=True, extra={'context': {'filter': filter_name}})
+    
+    return entry
+
+
 @api_app.get("/filters/options")
-async def get_filter_options(client: WorkspaceClient = Depends(get_databricks_client)):
-    """Get filter options from configuration"""
+async def get_filter_options(
+    nocache: bool = False,
+    client: WorkspaceClient = Depends(get_databricks_client)
+):
+    """
+    Get filter options from configuration
+    
+    Dynamic filter queries run concurrently and their values are cached per
+    (catalog, schema, filter) for FILTER_OPTIONS_CACHE_TTL_SECONDS; pass
+    ?nocache=1 to bypass the cache.
+    """
     logger.debug("Loading filter options")
     
     if not data_config:
@@ -195,96 +485,87 @@ async def get_filter_options(client: WorkspaceClient = Depends(get_databricks_cl
         logger.info("Filter options disabled in config")
         return {"enabled": False}
     
-    options = {"enabled": True, "filters": {}}
     enabled_filters = data_config.get_enabled_filters()
     logger.info(f"Loading {len(enabled_filters)} filter options", extra={'context': {'filters': enabled_filters}})
     
+    loaded: Dict[str, Dict[str, Any]] = {}
+    dynamic_filters: Dict[str, Dict[str, Any]] = {}
+    
     for filter_name in enabled_filters:
         filter_details = data_config.get_filter_details(filter_name)
         
         if filter_details.get('source') == 'static':
             # Static values from config
-            options['filters'][filter_name] = {
+            loaded[filter_name] = {
                 "label": filter_details.get('label', filter_name),
                 "values": filter_details.get('static_values', []),
                 "default": filter_details.get('default', 'all')
             }
             logger.debug(f"Loaded static filter: {filter_name}")
         elif filter_details.get('source') == 'dynamic':
-            # Query database for distinct values
-            try:
-                view_key = filter_details.get('query_view')
-                field = filter_details.get('query_field')
-                mapped_field = data_config.map_field(view_key, field)
-                
-                sql = f"""
-                    SELECT DISTINCT {mapped_field} as {field}
-                    FROM {data_config.get_full_table_name(view_key)}
-                    WHERE {mapped_field} IS NOT NULL
-                    ORDER BY {mapped_field}
-                """
-                
-                with LogTimer(query_logger, f"Dynamic filter query: {filter_name}", filter=filter_name, field=mapped_field):
-                    response = client.statement_execution.execute_statement(
-                        warehouse_id=SQL_WAREHOUSE_ID,
-                        statement=sql,
-                        catalog=CATALOG_NAME,
-                        schema=SCHEMA_NAME,
-                        wait_timeout="30s"
-                    )
-                
-                if response.status.state == StatementState.SUCCEEDED:
-                    values = []
-                    if response.result and response.result.data_array:
-                        values = [row[0] for row in response.result.data_array if row[0]]
-                    
-                    options['filters'][filter_name] = {
-                        "label": filter_details.get('label', filter_name),
-                        "values": values,
-                        "default": filter_details.get('default', 'all')
-                    }
-                    logger.info(f"Loaded dynamic filter: {filter_name} ({len(values)} values)")
-                else:
-                    logger.warning(f"Dynamic filter query failed: {filter_name}", extra={'context': {'state': response.status.state}})
-                    options['filters'][filter_name] = {
-                        "label": filter_details.get('label', filter_name),
-                        "values": [],
-                        "default": filter_details.get('default', 'all')
-                    }
-            except Exception as e:
-                logger.error(f"Failed to load dynamic filter: {filter_name}", exc_info=True, extra={'context': {'filter': filter_name}})
-                options['filters'][filter_name] = {
-                    "label": filter_details.get('label', filter_name),
-                    "values": [],
-                    "default": filter_details.get('default', 'all')
-                }
+            dynamic_filters[filter_name] = filter_details
+    
+    # Query all dynamic filters in parallel; each one handles its own errors
+    results = await asyncio.gather(*(
+        _load_dynamic_filter(client, filter_name, filter_details, nocache)
+        for filter_name, filter_details in dynamic_filters.items()
+    ))
+    loaded.update(zip(dynamic_filters, results))
+    
+    # Keep the configured filter order in the response
+    options = {"enabled": True, "filters": {}}
+    for filter_name in enabled_filters:
+        if filter_name in loaded:
+            options['filters'][filter_name] = loaded[filter_name]
     
     return options
 
 
+def _error_payload(e: Exception, sql: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Log a debug endpoint failure and build its error response
+    
+    The traceback is always logged; it is only echoed in the response body
+    when DEBUG_TRACEBACK=1.
+    """
+    logger.error(f"Debug endpoint failed: {str(e)}", exc_info=True, extra={'context': {'sql': sql}})
+    
+    payload = {
+        "status": "error",
+        "message": str(e),
+        "type": type(e).__name__,
+    }
+    if sql is not None:
+        payload["query"] = sql
+    if DEBUG_TRACEBACK:
+        payload["traceback"] = traceback.format_exc()
+    return payload
+
+
+# Environment snapshot served by /debug/config; env vars don't change at runtime
+_DEBUG_CONFIG = {
+    "env_vars": {
+        "DATABRICKS_HOST": DATABRICKS_HOST or "(not set)",
+        "DATABRICKS_SERVER_HOSTNAME": DATABRICKS_SERVER_HOSTNAME or "(not set)",
+        "DATABRICKS_HTTP_PATH": DATABRICKS_HTTP_PATH or "(not set)",
+        "SQL_WAREHOUSE_ID": SQL_WAREHOUSE_ID or "(not set)",
+        "DATABRICKS_TOKEN": "***" + DATABRICKS_TOKEN[-4:] if DATABRICKS_TOKEN else "(not set)",
+        "DATABRICKS_CLIENT_ID": DATABRICKS_CLIENT_ID[:8] + "..." if DATABRICKS_CLIENT_ID else "(not set)",
+        "DATABRICKS_CLIENT_SECRET": "***" + DATABRICKS_CLIENT_SECRET[-4:] if DATABRICKS_CLIENT_SECRET else "(not set)",
+        "CATALOG_NAME": CATALOG_NAME,
+        "SCHEMA_NAME": SCHEMA_NAME,
+    },
+    "computed": {
+        "full_host": f"https://{DATABRICKS_HOST}" if DATABRICKS_HOST and not DATABRICKS_HOST.startswith("https://") else DATABRICKS_HOST,
+        "auth_method": AUTH_METHOD
+    }
+}
+
+
 @api_app.get("/debug/config")
 async def debug_config():
     """Debug endpoint to show configuration"""
-    client_id = os.getenv("DATABRICKS_CLIENT_ID", "")
-    client_secret = os.getenv("DATABRICKS_CLIENT_SECRET", "")
-    
-    return {
-        "env_vars": {
-            "DATABRICKS_HOST": DATABRICKS_HOST or "(not set)",
-            "DATABRICKS_SERVER_HOSTNAME": DATABRICKS_SERVER_HOSTNAME or "(not set)",
-            "DATABRICKS_HTTP_PATH": DATABRICKS_HTTP_PATH or "(not set)",
-            "SQL_WAREHOUSE_ID": SQL_WAREHOUSE_ID or "(not set)",
-            "DATABRICKS_TOKEN": "***" + DATABRICKS_TOKEN[-4:] if DATABRICKS_TOKEN else "(not set)",
-            "DATABRICKS_CLIENT_ID": client_id[:8] + "..." if client_id else "(not set)",
-            "DATABRICKS_CLIENT_SECRET": "***" + client_secret[-4:] if client_secret else "(not set)",
-            "CATALOG_NAME": CATALOG_NAME,
-            "SCHEMA_NAME": SCHEMA_NAME,
-        },
-        "computed": {
-            "full_host": f"https://{DATABRICKS_HOST}" if DATABRICKS_HOST and not DATABRICKS_HOST.startswith("https://") else DATABRICKS_HOST,
-            "auth_method": "OAuth M2M" if client_id else "Token (if set)" if DATABRICKS_TOKEN else "None detected"
-        }
-    }
+    return _DEBUG_CONFIG
 
 
 @api_app.get("/debug/test-connection")
@@ -292,7 +573,7 @@ async def test_connection(client: WorkspaceClient = Depends(get_databricks_clien
     """Test Databricks connection"""
     try:
         # Try to list warehouses to verify connection
-        warehouses = list(client.warehouses.list())
+        warehouses = await _run_sdk(lambda: list(client.warehouses.list()))
         return {
             "status": "success",
             "message": "Connected to Databricks successfully",
@@ -300,13 +581,7 @@ async def test_connection(client: WorkspaceClient = Depends(get_databricks_clien
             "current_warehouse": SQL_WAREHOUSE_ID
         }
     except Exception as e:
-        import traceback
-        return {
-            "status": "error",
-            "message": str(e),
-            "type": type(e).__name__,
-            "traceback": traceback.format_exc()
-        }
+        return _error_payload(e)
 
 
 @api_app.get("/debug/test-query")
@@ -315,13 +590,7 @@ async def test_query(client: WorkspaceClient = Depends(get_databricks_client)):
     try:
         sql = f"SELECT 1 as test_column"
         
-        response = client.statement_execution.execute_statement(
-            warehouse_id=SQL_WAREHOUSE_ID,
-            statement=sql,
-            catalog=CATALOG_NAME,
-            schema=SCHEMA_NAME,
-            wait_timeout="30s"
-        )
+        response = await _exec_sql(client, sql)
         
         return {
             "status": "success",
@@ -330,13 +599,7 @@ async def test_query(client: WorkspaceClient = Depends(get_databricks_client)):
             "result": "Query executed successfully"
         }
     except Exception as e:
-        import traceback
-        return {
-            "status": "error",
-            "message": str(e),
-            "type": type(e).__name__,
-            "traceback": traceback.format_exc()
-        }
+        return _error_payload(e)
 
 
 @api_app.get("/debug/test-view")
@@ -345,13 +608,7 @@ async def test_view(client: WorkspaceClient = Depends(get_databricks_client)):
     try:
         sql = f"SELECT * FROM {CATALOG_NAME}.{SCHEMA_NAME}.v_membership_kpis LIMIT 1"
         
-        response = client.statement_execution.execute_statement(
-            warehouse_id=SQL_WAREHOUSE_ID,
-            statement=sql,
-            catalog=CATALOG_NAME,
-            schema=SCHEMA_NAME,
-            wait_timeout="30s"
-        )
+        response = await _exec_sql(client, sql)
         
         # Check if query succeeded
         if response.status.state != StatementState.SUCCEEDED:
@@ -372,18 +629,11 @@ async def test_view(client: WorkspaceClient = Depends(get_databricks_client)):
             "query": sql,
             "state": str(response.status.state),
             "row_count": len(response.result.data_array) if response.result and response.result.data_array else 0,
-            "columns": [col.name for col in response.manifest.schema.columns] if response.manifest else [],
+            "columns": _result_columns(response),
             "sample_row": response.result.data_array[0] if response.result and response.result.data_array else None
         }
     except Exception as e:
-        import traceback
-        return {
-            "status": "error",
-            "message": str(e),
-            "type": type(e).__name__,
-            "query": sql,
-            "traceback": traceback.format_exc()
-        }
+        return _error_payload(e, sql=sql)
 
 
 @api_app.get("/debug/list-tables")
@@ -393,13 +643,7 @@ async def list_tables(client: WorkspaceClient = Depends(get_databricks_client)):
         # Try to list tables in the schema
         sql = f"SHOW TABLES IN {CATALOG_NAME}.{SCHEMA_NAME}"
         
-        response = client.statement_execution.execute_statement(
-            warehouse_id=SQL_WAREHOUSE_ID,
-            statement=sql,
-            catalog=CATALOG_NAME,
-            schema=SCHEMA_NAME,
-            wait_timeout="30s"
-        )
+        response = await _exec_sql(client, sql)
         
         if response.status.state != StatementState.SUCCEEDED:
             return {
@@ -411,12 +655,7 @@ async def list_tables(client: WorkspaceClient = Depends(get_databricks_client)):
         # Extract table names
         tables = []
         if response.result and response.result.data_array:
-            for row in response.result.data_array:
-                tables.append({
-                    "database": row[0] if len(row) > 0 else None,
-                    "table_name": row[1] if len(row) > 1 else None,
-                    "is_temporary": row[2] if len(row) > 2 else None
-                })
+            tables = [dict(zip(_SHOW_TABLES_COLUMNS, row)) for row in response.result.data_array]
         
         return {
             "status": "success",
@@ -426,13 +665,7 @@ async def list_tables(client: WorkspaceClient = Depends(get_databricks_client)):
             "tables": tables
         }
     except Exception as e:
-        import traceback
-        return {
-            "status": "error",
-            "message": str(e),
-            "type": type(e).__name__,
-            "traceback": traceback.format_exc()
-        }
+        return _error_payload(e)
 
 
 @api_app.get("/debug/check-years")
@@ -453,13 +686,7 @@ async def check_available_years(client: WorkspaceClient = Depends(get_databricks
         ORDER BY year DESC
         """
         
-        response = client.statement_execution.execute_statement(
-            warehouse_id=SQL_WAREHOUSE_ID,
-            statement=sql,
-            catalog=CATALOG_NAME,
-            schema=SCHEMA_NAME,
-            wait_timeout="30s"
-        )
+        response = await _exec_sql(client, sql)
         
         if response.status.state != StatementState.SUCCEEDED:
             error_message = "Unknown error"
@@ -492,13 +719,7 @@ async def check_available_years(client: WorkspaceClient = Depends(get_databricks
             "recommendation": "Use the two most recent years with data for YTD comparison" if len(years_data) >= 2 else "Only one year of data available"
         }
     except Exception as e:
-        import traceback
-        return {
-            "status": "error",
-            "message": str(e),
-            "type": type(e).__name__,
-            "traceback": traceback.format_exc()
-        }
+        return _error_payload(e)
 
 
 @api_app.get("/debug/test-membership-trend")
@@ -520,13 +741,7 @@ async def test_membership_trend(client: WorkspaceClient = Depends(get_databricks
         LIMIT 12
         """
         
-        response = client.statement_execution.execute_statement(
-            warehouse_id=SQL_WAREHOUSE_ID,
-            statement=sql,
-            catalog=CATALOG_NAME,
-            schema=SCHEMA_NAME,
-            wait_timeout="30s"
-        )
+        response = await _exec_sql(client, sql)
         
         # Check if query succeeded
         if response.status.state != StatementState.SUCCEEDED:
@@ -544,57 +759,99 @@ async def test_membership_trend(client: WorkspaceClient = Depends(get_databricks
         # Parse results
         rows = []
         if response.result and response.result.data_array:
-            for row in response.result.data_array:
-                rows.append({
-                    "month_start": row[0] if len(row) > 0 else None,
-                    "active_members": row[1] if len(row) > 1 else None,
-                    "new_enrollments": row[2] if len(row) > 2 else None,
-                    "terminations": row[3] if len(row) > 3 else None,
-                    "avg_risk_score": row[4] if len(row) > 4 else None,
-                    "avg_pmpm": row[5] if len(row) > 5 else None,
-                })
+            rows = [dict(zip(_MEMBERSHIP_TREND_COLUMNS, row)) for row in response.result.data_array]
         
         return {
             "status": "success",
             "query": sql,
             "row_count": len(rows),
-            "columns": [col.name for col in response.manifest.schema.columns] if response.manifest else [],
+            "columns": _result_columns(response),
             "sample_data": rows[:3],  # First 3 rows
             "all_data": rows  # All rows for debugging
         }
     except Exception as e:
-        import traceback
-        return {
-            "status": "error",
-            "message": str(e),
-            "type": type(e).__name__,
-            "query": sql if 'sql' in locals() else "Query not generated",
-            "traceback": traceback.format_exc()
-        }
+        return _error_payload(e, sql=sql if 'sql' in locals() else "Query not generated")
 
 
-@api_app.post("/query", response_model=QueryResponse)
-async def execute_query(
-    request: QueryRequest,
-    client: WorkspaceClient = Depends(get_databricks_client)
-):
+def _open_external_link(url: str) -> requests.Response:
+    """Open one result chunk's presigned URL for streaming (no Databricks auth header)"""
+    response = requests.get(url, stream=True, timeout=EXTERNAL_LINK_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return response
+
+
+async def _iter_external_links(client: WorkspaceClient, response) -> AsyncGenerator[bytes, None]:
     """
-    Execute a SQL query against Databricks SQL warehouse
+    Yield the raw bytes of each EXTERNAL_LINKS result chunk in order
+    
+    Chunks are read in EXTERNAL_LINK_READ_BYTES pieces on the SQL thread pool
+    only as the consumer asks for them. StreamingResponse waits for each send
+    to the client before pulling the next piece, so a slow client stalls the
+    download instead of letting it buffer, and memory stays bounded by one piece.
     """
-    try:
-        warehouse_id = request.warehouse_id or SQL_WAREHOUSE_ID
+    loop = asyncio.get_running_loop()
+    result = response.result
+    
+    while result is not None:
+        for link in result.external_links or []:
+            download = await loop.run_in_executor(_sql_executor, _open_external_link, link.external_link)
+            try:
+                pieces = download.iter_content(EXTERNAL_LINK_READ_BYTES)
+                while (piece := await loop.run_in_executor(_sql_executor, next, pieces, None)) is not None:
+                    yield piece
+            finally:
+                download.close()
         
-        if not warehouse_id:
-            raise HTTPException(status_code=400, detail="SQL warehouse ID not configured")
+        if result.next_chunk_index is None:
+            break
+        result = await loop.run_in_executor(
+            _sql_executor,
+            client.statement_execution.get_statement_result_chunk_n,
+            response.statement_id,
+            result.next_chunk_index
+        )
 
-        # Execute the query
-        response = client.statement_execution.execute_statement(
-            warehouse_id=warehouse_id,
-            statement=request.sql,
-            catalog=CATALOG_NAME,
-            schema=SCHEMA_NAME,
-            wait_timeout="30s"
+
+async def _stream_arrow_result(
+    client: WorkspaceClient,
+    sql: str,
+    warehouse_id: str
+) -> StreamingResponse:
+    """
+    Execute a query with ARROW_STREAM results and forward the raw Arrow bytes
+    
+    Each result chunk is a self-contained Arrow IPC stream; chunks are sent
+    back to back, which apache-arrow's RecordBatchReader.readAll() consumes
+    directly.
+    """
+    response = await _exec_sql(
+        client,
+        sql,
+        warehouse_id=warehouse_id,
+        format=Format.ARROW_STREAM,
+        disposition=Disposition.EXTERNAL_LINKS
+    )
+    if response.status.state != StatementState.SUCCEEDED:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Query failed with state: {response.status.state}"
         )
+    
+    return StreamingResponse(_iter_external_links(client, response), media_type=ARROW_STREAM_MEDIA_TYPE)
+
+
+async def _run_sql(
+    sql: str,
+    client: WorkspaceClient,
+    warehouse_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Execute SQL and return it in the QueryResponse shape as a plain dict
+    
+    Used directly for server-built SQL so it skips request model validation.
+    """
+    try:
+        response = await _exec_sql(client, sql, warehouse_id=warehouse_id)
 
         # Check if query succeeded
         if response.status.state != StatementState.SUCCEEDED:
@@ -605,62 +862,252 @@ async def execute_query(
 
         # Parse results
         if not response.result or not response.result.data_array:
-            return QueryResponse(columns=[], data=[], row_count=0)
+            return {"columns": [], "data": [], "row_count": 0}
 
-        columns = [col.name for col in response.manifest.schema.columns] if response.manifest else []
+        columns = _result_columns(response)
         
         # Convert data array to list of dicts
-        data = []
-        for row in response.result.data_array:
-            row_dict = {}
-            for i, value in enumerate(row):
-                if i < len(columns):
-                    row_dict[columns[i]] = value
-            data.append(row_dict)
-
-        return QueryResponse(
-            columns=columns,
-            data=data,
-            row_count=len(data)
-        )
+        data = [dict(zip(columns, row)) for row in response.result.data_array]
+
+        return {"columns": columns, "data": data, "row_count": len(data)}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_app.post("/query", response_model=QueryResponse)
+async def execute_query(
+    request: QueryRequest,
+    client: WorkspaceClient = Depends(get_databricks_client),
+    accept: Annotated[Optional[str], Header()] = None
+):
+    """
+    Execute a SQL query against Databricks SQL warehouse
+    
+    Clients sending Accept: application/vnd.apache.arrow.stream get the
+    result as Arrow IPC instead of JSON rows.
+    """
+    try:
+        warehouse_id = request.warehouse_id or SQL_WAREHOUSE_ID
+        
+        if not warehouse_id:
+            raise HTTPException(status_code=400, detail="SQL warehouse ID not configured")
+        
+        if accept and ARROW_STREAM_MEDIA_TYPE in accept:
+            return await _stream_arrow_result(client, request.sql, warehouse_id)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return await _run_sql(request.sql, client, warehouse_id)
+
+
+@api_app.post("/query/stream")
+async def stream_query(
+    request: QueryRequest,
+    client: WorkspaceClient = Depends(get_databricks_client)
+):
+    """
+    Execute a SQL query and stream the rows as newline-delimited JSON
+    
+    Rows are serialized in batches as result chunks arrive from the warehouse,
+    so large results never sit in memory as a full list of dicts.
+    """
+    warehouse_id = request.warehouse_id or SQL_WAREHOUSE_ID
+    if not warehouse_id:
+        raise HTTPException(status_code=400, detail="SQL warehouse ID not configured")
+    
+    response = await _exec_sql(client, request.sql, warehouse_id=warehouse_id)
+    if response.status.state != StatementState.SUCCEEDED:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Query failed with state: {response.status.state}"
+        )
+    
+    columns = _result_columns(response)
+    
+    async def generate_ndjson():
+        loop = asyncio.get_running_loop()
+        result = response.result
+        
+        while result is not None:
+            rows = result.data_array or []
+            for start in range(0, len(rows), QUERY_STREAM_BATCH_ROWS):
+                yield b"".join(
+                    orjson.dumps(dict(zip(columns, row))) + b"\n"
+                    for row in rows[start:start + QUERY_STREAM_BATCH_ROWS]
+                )
+            
+            if result.next_chunk_index is None:
+                break
+            result = await loop.run_in_executor(
+                _sql_executor,
+                client.statement_execution.get_statement_result_chunk_n,
+                response.statement_id,
+                result.next_chunk_index
+            )
+    
+    return StreamingResponse(generate_ndjson(), media_type="application/x-ndjson")
+
+
+@lru_cache(maxsize=128)
+def _build_view_query(
+    view_key: str,
+    fields: tuple,
+    order_by: Optional[str] = None,
+    limit: Optional[int] = None
+) -> str:
+    """
+    Build view SQL from the data config once per argument set
+    
+    The config is loaded at startup and never changes, so the generated SQL
+    is immutable; caching it also keeps the query text stable for warehouse
+    plan and result caching.
+    """
+    return data_config.build_query(view_key, list(fields), order_by=order_by, limit=limit)
+
+
+def _conditional_response(
+    request: Request,
+    body: bytes,
+    etag: Optional[str] = None,
+    cache_control: str = VIEW_CACHE_CONTROL
+) -> Response:
+    """
+    Return a JSON body with an ETag, or 304 if the client already has it
+    
+    Dashboards poll the same endpoints repeatedly; a matching If-None-Match
+    skips sending the body again.
+    """
+    if etag is None:
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Weak comparison, as If-None-Match requires
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag.removeprefix("W/") in candidates or "*" in candidates:
+            return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _fetch_view_result(sql: str, client: WorkspaceClient) -> tuple:
+    """Execute a view query and cache its serialized body and ETag"""
+    if not SQL_WAREHOUSE_ID:
+        raise HTTPException(status_code=500, detail="SQL warehouse ID not configured")
+    
+    # View SQL is built server-side, so it skips client query validation
+    body = orjson.dumps(await _run_sql(sql, client))
+    cached = (body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+    _view_cache[sql] = cached
+    return cached
+
+
+async def _refresh_hot_query(sql: str, client: WorkspaceClient):
+    """
+    Re-run a hot view query ahead of cache expiry until it goes idle
+    
+    Dashboards keep hitting a warm cache instead of paying the cold query
+    latency; the loop stops once nobody has requested the view for
+    HOT_QUERY_IDLE_SECONDS so the warehouse can still auto-stop.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while loop.time() - _hot_query_last_seen[sql] < HOT_QUERY_IDLE_SECONDS:
+            await asyncio.sleep(HOT_QUERY_REFRESH_SECONDS)
+            try:
+                await _fetch_view_result(sql, client)
+            except Exception as e:
+                query_logger.warning(f"Hot query refresh failed: {str(e)}")
+    finally:
+        _hot_query_refreshers.pop(sql, None)
+        _hot_query_counts[sql] = 0
+
+
+def _track_hot_query(sql: str, client: WorkspaceClient):
+    """Count view query executions and start refresh-ahead once one turns hot"""
+    _hot_query_last_seen[sql] = asyncio.get_running_loop().time()
+    if HOT_QUERY_REFRESH_SECONDS <= 0 or sql in _hot_query_refreshers:
+        return
+    
+    _hot_query_counts[sql] = _hot_query_counts.get(sql, 0) + 1
+    if _hot_query_counts[sql] >= HOT_QUERY_THRESHOLD:
+        query_logger.info("Starting refresh-ahead for hot view query", extra={'context': {
+            'sql': sql,
+            'interval_seconds': HOT_QUERY_REFRESH_SECONDS
+        }})
+        _hot_query_refreshers[sql] = asyncio.create_task(_refresh_hot_query(sql, client))
+
+
+async def _cached_exec(
+    sql: str,
+    client: WorkspaceClient,
+    request: Request,
+    nocache: bool = False
+) -> Response:
+    """
+    Run a fixed view query through the result cache
+    
+    View SQL carries no per-user parameters, so results are shared across
+    requests for VIEW_CACHE_TTL_SECONDS, keyed by the exact SQL string. The
+    serialized body and its ETag are cached together so hits skip both the
+    warehouse and serialization.
+    """
+    _track_hot_query(sql, client)
+    
+    cached = None if nocache else _view_cache.get(sql)
+    if cached is None:
+        cached = await _fetch_view_result(sql, client)
+    
+    body, etag = cached
+    return _conditional_response(request, body, etag)
+
+
 @api_app.get("/views/membership_kpis")
-async def get_membership_kpis(client: WorkspaceClient = Depends(get_databricks_client)):
+async def get_membership_kpis(
+    request: Request,
+    nocache: bool = False,
+    client: WorkspaceClient = Depends(get_databricks_client)
+):
     """Get membership KPIs data"""
     if data_config:
         # Use config-driven query
-        fields = ['month_start', 'total_members', 'new_enrollments', 'terminations', 'avg_risk_score', 'avg_tenure']
-        sql = data_config.build_query('membership_kpis', fields, order_by='month_start DESC', limit=12)
+        fields = ('month_start', 'total_members', 'new_enrollments', 'terminations', 'avg_risk_score', 'avg_tenure')
+        sql = _build_view_query('membership_kpis', fields, order_by='month_start DESC', limit=12)
     else:
         # Fallback to hardcoded query
         sql = f"SELECT * FROM {CATALOG_NAME}.{SCHEMA_NAME}.v_membership_kpis ORDER BY month_start DESC LIMIT 12"
     
-    request = QueryRequest(sql=sql)
-    return await execute_query(request, client)
+    return await _cached_exec(sql, client, request, nocache)
 
 
 @api_app.get("/views/product_mix")
-async def get_product_mix(client: WorkspaceClient = Depends(get_databricks_client)):
+async def get_product_mix(
+    request: Request,
+    nocache: bool = False,
+    client: WorkspaceClient = Depends(get_databricks_client)
+):
     """Get product mix data"""
     if data_config:
-        fields = ['product_line', 'members', 'avg_age', 'avg_risk']
-        sql = data_config.build_query('product_mix', fields, order_by='members DESC')
+        fields = ('product_line', 'members', 'avg_age', 'avg_risk')
+        sql = _build_view_query('product_mix', fields, order_by='members DESC')
     else:
         sql = f"SELECT * FROM {CATALOG_NAME}.{SCHEMA_NAME}.v_product_mix ORDER BY members DESC"
     
-    request = QueryRequest(sql=sql)
-    return await execute_query(request, client)
+    return await _cached_exec(sql, client, request, nocache)
 
 
 @api_app.get("/views/age_distribution")
-async def get_age_distribution(client: WorkspaceClient = Depends(get_databricks_client)):
+async def get_age_distribution(
+    request: Request,
+    nocache: bool = False,
+    client: WorkspaceClient = Depends(get_databricks_client)
+):
     """Get age distribution data"""
     if data_config:
-        fields = ['age_range', 'members', 'avg_risk', 'high_risk_pct']
+        fields = ('age_range', 'members', 'avg_risk', 'high_risk_pct')
         order_clause = """CASE 
           WHEN age_range = '0-17' THEN 1
           WHEN age_range = '18-34' THEN 2
@@ -668,7 +1115,7 @@ async def get_age_distribution(client: WorkspaceClient = Depends(get_databricks_
           WHEN age_range = '50-64' THEN 4
           WHEN age_range = '65+' THEN 5
         END"""
-        sql = data_config.build_query('age_distribution', fields, order_by=order_clause)
+        sql = _build_view_query('age_distribution', fields, order_by=order_clause)
     else:
         sql = f"""SELECT * FROM {CATALOG_NAME}.{SCHEMA_NAME}.v_age_distribution
                   ORDER BY CASE WHEN age_range = '0-17' THEN 1
@@ -677,34 +1124,39 @@ async def get_age_distribution(client: WorkspaceClient = Depends(get_databricks_
                           WHEN age_range = '50-64' THEN 4
                           WHEN age_range = '65+' THEN 5 END"""
     
-    request = QueryRequest(sql=sql)
-    return await execute_query(request, client)
+    return await _cached_exec(sql, client, request, nocache)
 
 
 @api_app.get("/views/region_summary")
-async def get_region_summary(client: WorkspaceClient = Depends(get_databricks_client)):
+async def get_region_summary(
+    request: Request,
+    nocache: bool = False,
+    client: WorkspaceClient = Depends(get_databricks_client)
+):
     """Get region summary data"""
     if data_config:
-        fields = ['region', 'members', 'avg_age', 'avg_risk']
-        sql = data_config.build_query('region_summary', fields, order_by='members DESC')
+        fields = ('region', 'members', 'avg_age', 'avg_risk')
+        sql = _build_view_query('region_summary', fields, order_by='members DESC')
     else:
         sql = f"SELECT * FROM {CATALOG_NAME}.{SCHEMA_NAME}.v_region_summary ORDER BY members DESC"
     
-    request = QueryRequest(sql=sql)
-    return await execute_query(request, client)
+    return await _cached_exec(sql, client, request, nocache)
 
 
 @api_app.get("/views/chronic_conditions")
-async def get_chronic_conditions(client: WorkspaceClient = Depends(get_databricks_client)):
+async def get_chronic_conditions(
+    request: Request,
+    nocache: bool = False,
+    client: WorkspaceClient = Depends(get_databricks_client)
+):
     """Get chronic conditions data"""
     if data_config:
-        fields = ['condition_name', 'prevalence', 'members', 'avg_cost']
-        sql = data_config.build_query('chronic_conditions', fields, order_by='prevalence DESC')
+        fields = ('condition_name', 'prevalence', 'members', 'avg_cost')
+        sql = _build_view_query('chronic_conditions', fields, order_by='prevalence DESC')
     else:
         sql = f"SELECT * FROM {CATALOG_NAME}.{SCHEMA_NAME}.v_chronic_conditions ORDER BY prevalence DESC"
     
-    request = QueryRequest(sql=sql)
-    return await execute_query(request, client)
+    return await _cached_exec(sql, client, request, nocache)
 
 
 @api_app.post("/drilldown")
@@ -717,10 +1169,10 @@ async def execute_drilldown(
     """Execute drill-down query with permission checks"""
     try:
         # Get config service
-        config_svc = get_config_service(client, SQL_WAREHOUSE_ID, CONFIG_CATALOG, CONFIG_SCHEMA)
+        config_svc = await _run_sdk(get_config_service, client, SQL_WAREHOUSE_ID, CONFIG_CATALOG, CONFIG_SCHEMA)
         
         # Get visualization config
-        viz_config = config_svc.get_viz_configs()
+        viz_config = await _run_sdk(config_svc.get_viz_configs)
         viz = next((v for v in viz_config if v.id == viz_id), None)
         
         if not viz or not viz.allow_drill_down:
@@ -729,7 +1181,7 @@ async def execute_drilldown(
         # Get drill-down query
         if viz.drill_down_config and viz.drill_down_config.get('query_id'):
             drill_query_id = viz.drill_down_config['query_id']
-            query_config = config_svc.get_query_config(drill_query_id)
+            query_config = await _run_sdk(config_svc.get_query_config, drill_query_id)
             
             if not query_config:
                 raise HTTPException(status_code=404, detail="Drill-down query not found")
@@ -739,32 +1191,25 @@ async def execute_drilldown(
             params['catalog'] = CATALOG_NAME
             params['schema'] = SCHEMA_NAME
             
-            sql = config_svc.build_query_from_template(drill_query_id, params)
+            sql = await _run_sdk(config_svc.build_query_from_template, drill_query_id, params)
         else:
             raise HTTPException(status_code=400, detail="No drill-down query configured")
         
         # Check permissions
         permissions_svc = get_permissions_service(client)
-        sql = check_query_permissions(sql, user, permissions_svc)
+        await resolve_user_groups(user)
+        sql = await _run_sdk(check_query_permissions, sql, user, permissions_svc)
         
         # Execute query
-        response = client.statement_execution.execute_statement(
-            warehouse_id=SQL_WAREHOUSE_ID,
-            statement=sql,
-            catalog=CATALOG_NAME,
-            schema=SCHEMA_NAME,
-            wait_timeout="30s"
-        )
+        response = await _exec_sql(client, sql)
         
         if response.status.state != StatementState.SUCCEEDED:
             raise HTTPException(status_code=500, detail="Drill-down query failed")
         
-        columns = [col.name for col in response.manifest.schema.columns] if response.manifest else []
+        columns = _result_columns(response)
         data = []
         if response.result and response.result.data_array:
-            for row in response.result.data_array:
-                row_dict = {columns[i]: val for i, val in enumerate(row) if i < len(columns)}
-                data.append(row_dict)
+            data = [dict(zip(columns, row)) for row in response.result.data_array]
         
         return {"columns": columns, "data": data, "row_count": len(data)}
         
@@ -816,12 +1261,40 @@ async def generate_ai_report(
     report_type: str,
     dashboard_data: Dict[str, Any],
     user_prompt: Optional[str] = None,
+    stream: bool = False,
     user: UserContext = Depends(get_user_context),
     client: WorkspaceClient = Depends(get_databricks_client)
 ):
-    """Generate AI-powered report"""
+    """
+    Generate AI-powered report
+    
+    With ?stream=1 the report is sent as server-sent events while the model
+    generates it: one {"delta": ...} frame per chunk, then {"done": true}.
+    """
     try:
         report_gen = get_report_generator(client, AI_MODEL_ENDPOINT)
+        
+        if stream:
+            async def generate_events():
+                try:
+                    async for delta in report_gen.stream_report(
+                        report_type=report_type,
+                        dashboard_data=dashboard_data,
+                        user_prompt=user_prompt,
+                        user_context=user
+                    ):
+                        yield b"data: " + orjson.dumps({"delta": delta}) + b"\n\n"
+                    yield b'data: {"done":true}\n\n'
+                except Exception as e:
+                    logger.error(f"AI report streaming failed: {str(e)}")
+                    yield b"data: " + orjson.dumps({"error": str(e)}) + b"\n\n"
+            
+            return StreamingResponse(
+                generate_events(),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
         result = await report_gen.generate_report(
             report_type=report_type,
             dashboard_data=dashboard_data,
@@ -834,6 +1307,72 @@ async def generate_ai_report(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_app.post("/ai/generate-report/stream")
+async def stream_ai_report(
+    report_type: str,
+    dashboard_data: Dict[str, Any],
+    user_prompt: Optional[str] = None,
+    user: UserContext = Depends(get_user_context),
+    client: WorkspaceClient = Depends(get_databricks_client)
+):
+    """Alias for /ai/generate-report?stream=1 (same server-sent event frames)"""
+    return await generate_ai_report(
+        report_type=report_type,
+        dashboard_data=dashboard_data,
+        user_prompt=user_prompt,
+        stream=True,
+        user=user,
+        client=client
+    )
+
+
+class AIReportBatchRequest(BaseModel):
+    reports: List[Dict[str, Any]]
+
+
+@api_app.post("/ai/generate-reports")
+async def generate_ai_reports_batch(
+    request: AIReportBatchRequest,
+    user: UserContext = Depends(get_user_context),
+    client: WorkspaceClient = Depends(get_databricks_client)
+):
+    """Generate several AI-powered reports concurrently"""
+    try:
+        report_gen = get_report_generator(client, AI_MODEL_ENDPOINT)
+        results = await report_gen.generate_reports_batch(
+            specs=request.reports,
+            user_context=user
+        )
+        return {"reports": results}
+    except Exception as e:
+        logger.error(f"AI batch report generation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+class AICombinedReportRequest(BaseModel):
+    report_types: List[str]
+    dashboard_data: Dict[str, Any]
+
+
+@api_app.post("/ai/generate-reports/combined")
+async def generate_ai_reports_combined(
+    request: AICombinedReportRequest,
+    user: UserContext = Depends(get_user_context),
+    client: WorkspaceClient = Depends(get_databricks_client)
+):
+    """Generate several report types for one dashboard in a single model call"""
+    try:
+        report_gen = get_report_generator(client, AI_MODEL_ENDPOINT)
+        return await report_gen.generate_reports_marshaled(
+            report_types=request.report_types,
+            dashboard_data=request.dashboard_data,
+            user_context=user
+        )
+    except Exception as e:
+        logger.error(f"AI combined report generation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @api_app.post("/export/csv")
 async def export_csv_streaming(
     query_id: str,
@@ -845,8 +1384,8 @@ async def export_csv_streaming(
     async def generate_csv():
         try:
             # Get query config
-            config_svc = get_config_service(client, SQL_WAREHOUSE_ID, CONFIG_CATALOG, CONFIG_SCHEMA)
-            query_config = config_svc.get_query_config(query_id)
+            config_svc = await _run_sdk(get_config_service, client, SQL_WAREHOUSE_ID, CONFIG_CATALOG, CONFIG_SCHEMA)
+            query_config = await _run_sdk(config_svc.get_query_config, query_id)
             
             if not query_config:
                 yield "Error: Query not found\n"
@@ -854,33 +1393,44 @@ async def export_csv_streaming(
             
             # Build and check permissions
             params = {**filters, 'catalog': CATALOG_NAME, 'schema': SCHEMA_NAME}
-            sql = config_svc.build_query_from_template(query_id, params)
+            sql = await _run_sdk(config_svc.build_query_from_template, query_id, params)
             
             permissions_svc = get_permissions_service(client)
-            sql = check_query_permissions(sql, user, permissions_svc)
+            await resolve_user_groups(user)
+            sql = await _run_sdk(check_query_permissions, sql, user, permissions_svc)
             
-            # Execute query
-            response = client.statement_execution.execute_statement(
-                warehouse_id=SQL_WAREHOUSE_ID,
-                statement=sql,
-                catalog=CATALOG_NAME,
-                schema=SCHEMA_NAME,
-                wait_timeout="60s"
+            # Execute query; the warehouse writes the CSV and we forward its chunks
+            response = await _exec_sql(
+                client,
+                sql,
+                wait_timeout="60s",
+                format=Format.CSV,
+                disposition=Disposition.EXTERNAL_LINKS
             )
             
             if response.status.state != StatementState.SUCCEEDED:
                 yield "Error: Query failed\n"
                 return
             
-            # Write headers
-            columns = [col.name for col in response.manifest.schema.columns] if response.manifest else []
-            yield ','.join(f'"{col}"' for col in columns) + '\n'
+            if response.result and response.result.external_links:
+                async for chunk in _iter_external_links(client, response):
+                    yield chunk
+                return
+            
+            # Fallback for inline results: encode headers and rows in batches
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, quoting=csv.QUOTE_MINIMAL)
+            writer.writerow(_result_columns(response))
             
-            # Stream rows
-            if response.result and response.result.data_array:
-                for row in response.result.data_array:
-                    csv_row = ','.join(f'"{str(val)}"' for val in row)
-                    yield csv_row + '\n'
+            rows = response.result.data_array if response.result and response.result.data_array else []
+            for start in range(0, len(rows), QUERY_STREAM_BATCH_ROWS):
+                writer.writerows(rows[start:start + QUERY_STREAM_BATCH_ROWS])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            
+            if buffer.tell():
+                yield buffer.getvalue()
                     
         except Exception as e:
             logger.error(f"CSV export failed: {str(e)}")
@@ -914,9 +1464,10 @@ async def list_admin_queries(
 ):
     """List all query configurations"""
     try:
-        config_svc = get_config_service(client, SQL_WAREHOUSE_ID, CONFIG_CATALOG, CONFIG_SCHEMA)
-        queries = config_svc.get_all_queries()
-        return [q.__dict__ for q in queries]
+        config_svc = await _run_sdk(get_config_service, client, SQL_WAREHOUSE_ID, CONFIG_CATALOG, CONFIG_SCHEMA)
+        queries = await _run_sdk(config_svc.get_all_queries)
+        # orjson serializes the config dataclasses directly
+        return ORJSONResponse(queries)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -928,14 +1479,63 @@ async def list_admin_filters(
 ):
     """List all filter configurations"""
     try:
-        config_svc = get_config_service(client, SQL_WAREHOUSE_ID, CONFIG_CATALOG, CONFIG_SCHEMA)
-        filters = config_svc.get_filter_configs()
-        return [f.__dict__ for f in filters]
+        config_svc = await _run_sdk(get_config_service, client, SQL_WAREHOUSE_ID, CONFIG_CATALOG, CONFIG_SCHEMA)
+        filters = await _run_sdk(config_svc.get_filter_configs)
+        return ORJSONResponse(filters)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # AI Dashboard Generation Endpoints
+
+# Tables offered to the dashboard generator
+# For now, we'll use a simplified approach - in production, query permissions_service
+AI_AVAILABLE_TABLES = (
+    "v_membership_kpis",
+    "v_product_mix",
+    "v_age_distribution",
+    "dim_member",
+    "fact_membership_monthly"
+)
+
+
+def _ai_cache_key(*parts: str) -> str:
+    """Cache key for an AI response, hashed over everything that shapes the prompt"""
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+# Shared dashboard generator, so its model-serving connections are reused
+_ai_dashboard_generator = None
+_ai_dashboard_generator_lock = threading.Lock()
+
+
+def get_ai_dashboard_generator(client: WorkspaceClient):
+    """Get or create the shared AIDashboardGenerator"""
+    global _ai_dashboard_generator
+    if _ai_dashboard_generator is not None:
+        return _ai_dashboard_generator
+    
+    with _ai_dashboard_generator_lock:
+        if _ai_dashboard_generator is None:
+            from ai_dashboard_generator import AIDashboardGenerator
+            _ai_dashboard_generator = AIDashboardGenerator(client)
+    return _ai_dashboard_generator
+
+
+def _heuristic_visualization(data_summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Simple visualization suggestion from the data shape"""
+    columns = data_summary.get('columns') or []
+    return {
+        "chart_type": "bar",
+        "reasoning": "Bar chart recommended for categorical comparisons",
+        "config": {
+            "xAxis": columns[0] if columns else "",
+            "yAxis": columns[1] if len(columns) > 1 else "",
+            "aggregation": "SUM"
+        }
+    }
+
+
 class AIDashboardRequest(BaseModel):
     prompt: str
 
@@ -946,36 +1546,33 @@ class AIVisualizationRequest(BaseModel):
 @api_app.post("/ai/generate-dashboard")
 async def generate_dashboard_with_ai(
     request: AIDashboardRequest,
+    nocache: bool = False,
     user: UserContext = Depends(get_user_context),
     client: WorkspaceClient = Depends(get_databricks_client)
 ):
     """
     Generate a complete dashboard configuration from a natural language prompt.
     Uses Databricks Foundation Models to create tabs, visualizations, queries, and filters.
+    Identical prompts are answered from a TTL cache; admins can pass ?nocache=1.
     """
     try:
-        from ai_dashboard_generator import AIDashboardGenerator
-        
-        generator = AIDashboardGenerator(client)
-        
-        # Get list of tables user has access to
-        # For now, we'll use a simplified approach - in production, query permissions_service
-        available_tables = [
-            "v_membership_kpis",
-            "v_product_mix",
-            "v_age_distribution",
-            "dim_member",
-            "fact_membership_monthly"
-        ]
+        cache_key = _ai_cache_key("dashboard", request.prompt, CATALOG_NAME, SCHEMA_NAME, *AI_AVAILABLE_TABLES)
+        if not (nocache and (await resolve_user_groups(user)).is_admin):
+            cached = _ai_response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        generator = get_ai_dashboard_generator(client)
         
         result = await generator.generate_dashboard_from_prompt(
             user_context=user,
             prompt=request.prompt,
-            available_tables=available_tables,
+            available_tables=list(AI_AVAILABLE_TABLES),
             catalog=CATALOG_NAME,
             schema=SCHEMA_NAME
         )
         
+        _ai_response_cache[cache_key] = result
         return result
         
     except Exception as e:
@@ -986,16 +1583,29 @@ async def generate_dashboard_with_ai(
 @api_app.post("/ai/suggest-visualization")
 async def suggest_visualization_with_ai(
     request: AIVisualizationRequest,
+    nocache: bool = False,
     user: UserContext = Depends(get_user_context),
     client: WorkspaceClient = Depends(get_databricks_client)
 ):
     """
     Suggest the best visualization type for given data and user question.
+    Identical requests are answered from a TTL cache; admins can pass ?nocache=1.
+    Falls back to a heuristic suggestion when the AI generator isn't deployed.
     """
     try:
-        from ai_dashboard_generator import AIDashboardGenerator
+        logger.info(f"AI visualization suggestion for user: {user.email}")
+        
+        summary = orjson.dumps(request.data_summary, option=orjson.OPT_SORT_KEYS).decode()
+        cache_key = _ai_cache_key("visualization", summary, request.user_question)
+        if not (nocache and (await resolve_user_groups(user)).is_admin):
+            cached = _ai_response_cache.get(cache_key)
+            if cached is not None:
+                return cached
         
-        generator = AIDashboardGenerator(client)
+        try:
+            generator = get_ai_dashboard_generator(client)
+        except ImportError:
+            return _heuristic_visualization(request.data_summary)
         
         result = await generator.suggest_visualization(
             user_context=user,
@@ -1003,6 +1613,7 @@ async def suggest_visualization_with_ai(
             user_question=request.user_question
         )
         
+        _ai_response_cache[cache_key] = result
         return result
         
     except Exception as e:
@@ -1014,25 +1625,70 @@ async def suggest_visualization_with_ai(
 # Unity Catalog Browser Endpoints (with Authorization)
 # ============================================================================
 
+async def _cached_catalog_lookup(request: Request, key: tuple, loader) -> Response:
+    """
+    Return a cached catalog browser response, loading it once on a miss
+    
+    Concurrent misses for the same key await one in-flight load, so expanding
+    the same tree node from several requests costs one workspace call. The
+    body is cached serialized with a weak ETag, so revisiting an unchanged
+    node is a 304 with no body.
+    """
+    cached = _catalog_cache.get(key)
+    while cached is None:
+        inflight = _catalog_inflight.get(key)
+        if inflight is not None:
+            try:
+                # shield: this request going away must not cancel the shared load
+                cached = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The loading request was cancelled; take over the load
+                cached = _catalog_cache.get(key)
+            continue
+        
+        inflight = asyncio.get_running_loop().create_future()
+        _catalog_inflight[key] = inflight
+        try:
+            body = orjson.dumps(await _run_sdk(loader))
+            cached = (body, f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+            _catalog_cache[key] = cached
+            inflight.set_result(cached)
+        except Exception as e:
+            inflight.set_exception(e)
+            inflight.exception()  # waiters re-raise it; don't warn if there are none
+            raise
+        except BaseException:
+            inflight.cancel()
+            raise
+        finally:
+            _catalog_inflight.pop(key, None)
+    
+    body, etag = cached
+    return _conditional_response(request, body, etag, cache_control=CATALOG_CACHE_CONTROL)
+
+
 @api_app.get("/catalog/catalogs")
 async def list_catalogs(
+    request: Request,
     user: UserContext = Depends(get_user_context),
     client: WorkspaceClient = Depends(get_databricks_client)
 ):
     """List catalogs accessible to the user"""
     try:
-        logger.info(f"Listing catalogs for user: {user.email}")
-        
-        catalogs = []
-        for catalog in client.catalogs.list():
-            catalogs.append({
-                "name": catalog.name,
-                "comment": catalog.comment or "",
-                "owner": catalog.owner or ""
-            })
+        def load():
+            logger.info(f"Listing catalogs for user: {user.email}")
+            
+            catalogs = [
+                {"name": c.name, "comment": c.comment or "", "owner": c.owner or ""}
+                for c in client.catalogs.list()
+            ]
+            
+            logger.info(f"Found {len(catalogs)} catalogs for user {user.email}")
+            return {"catalogs": catalogs}
         
-        logger.info(f"Found {len(catalogs)} catalogs for user {user.email}")
-        return {"catalogs": catalogs}
+        return await _cached_catalog_lookup(request, ("catalogs", user.email), load)
         
     except Exception as e:
         logger.error(f"Failed to list catalogs: {e}", exc_info=True)
@@ -1041,25 +1697,25 @@ async def list_catalogs(
 
 @api_app.get("/catalog/schemas")
 async def list_schemas(
+    request: Request,
     catalog: str,
     user: UserContext = Depends(get_user_context),
     client: WorkspaceClient = Depends(get_databricks_client)
 ):
     """List schemas in a catalog accessible to the user"""
     try:
-        logger.info(f"Listing schemas in catalog '{catalog}' for user: {user.email}")
-        
-        schemas = []
-        for schema in client.schemas.list(catalog_name=catalog):
-            schemas.append({
-                "name": schema.name,
-                "catalog": catalog,
-                "comment": schema.comment or "",
-                "owner": schema.owner or ""
-            })
+        def load():
+            logger.info(f"Listing schemas in catalog '{catalog}' for user: {user.email}")
+            
+            schemas = [
+                {"name": s.name, "catalog": catalog, "comment": s.comment or "", "owner": s.owner or ""}
+                for s in client.schemas.list(catalog_name=catalog)
+            ]
+            
+            logger.info(f"Found {len(schemas)} schemas in '{catalog}' for user {user.email}")
+            return {"schemas": schemas}
         
-        logger.info(f"Found {len(schemas)} schemas in '{catalog}' for user {user.email}")
-        return {"schemas": schemas}
+        return await _cached_catalog_lookup(request, ("schemas", user.email, catalog), load)
         
     except Exception as e:
         logger.error(f"Failed to list schemas in '{catalog}': {e}", exc_info=True)
@@ -1068,6 +1724,7 @@ async def list_schemas(
 
 @api_app.get("/catalog/tables")
 async def list_tables(
+    request: Request,
     catalog: str,
     schema: str,
     user: UserContext = Depends(get_user_context),
@@ -1075,29 +1732,81 @@ async def list_tables(
 ):
     """List tables in a schema accessible to the user"""
     try:
-        logger.info(f"Listing tables in '{catalog}.{schema}' for user: {user.email}")
+        def load():
+            logger.info(f"Listing tables in '{catalog}.{schema}' for user: {user.email}")
+            
+            tables = [
+                {
+                    "name": t.name,
+                    "catalog": catalog,
+                    "schema": schema,
+                    "table_type": t.table_type.value if t.table_type else "TABLE",
+                    "comment": t.comment or "",
+                    "owner": t.owner or ""
+                }
+                for t in client.tables.list(catalog_name=catalog, schema_name=schema)
+            ]
+            
+            logger.info(f"Found {len(tables)} tables in '{catalog}.{schema}' for user {user.email}")
+            return {"tables": tables}
         
-        tables = []
-        for table in client.tables.list(catalog_name=catalog, schema_name=schema):
-            tables.append({
-                "name": table.name,
+        return await _cached_catalog_lookup(request, ("tables", user.email, catalog, schema), load)
+        
+    except Exception as e:
+        logger.error(f"Failed to list tables in '{catalog}.{schema}': {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_app.get("/catalog/tree")
+async def get_catalog_tree(
+    request: Request,
+    catalog: str,
+    user: UserContext = Depends(get_user_context),
+    client: WorkspaceClient = Depends(get_databricks_client)
+):
+    """List every schema in a catalog with its tables, fetching schemas in parallel"""
+    try:
+        logger.info(f"Building catalog tree for '{catalog}' for user: {user.email}")
+        
+        schemas = await _run_sdk(lambda: list(client.schemas.list(catalog_name=catalog)))
+        table_lists = await asyncio.gather(*(
+            _run_sdk(lambda name=s.name: list(client.tables.list(catalog_name=catalog, schema_name=name)))
+            for s in schemas
+        ))
+        
+        tree = [
+            {
+                "name": s.name,
                 "catalog": catalog,
-                "schema": schema,
-                "table_type": table.table_type.value if table.table_type else "TABLE",
-                "comment": table.comment or "",
-                "owner": table.owner or ""
-            })
+                "comment": s.comment or "",
+                "owner": s.owner or "",
+                "tables": [
+                    {
+                        "name": t.name,
+                        "table_type": t.table_type.value if t.table_type else "TABLE",
+                        "comment": t.comment or ""
+                    }
+                    for t in tables
+                ]
+            }
+            for s, tables in zip(schemas, table_lists)
+        ]
         
-        logger.info(f"Found {len(tables)} tables in '{catalog}.{schema}' for user {user.email}")
-        return {"tables": tables}
+        logger.info(f"Built tree for '{catalog}' with {len(tree)} schemas for user {user.email}")
+        return _conditional_response(
+            request,
+            orjson.dumps({"catalog": catalog, "schemas": tree}),
+            cache_control=CATALOG_CACHE_CONTROL
+        )
         
     except Exception as e:
-        logger.error(f"Failed to list tables in '{catalog}.{schema}': {e}", exc_info=True)
+        logger.error(f"Failed to build catalog tree for '{catalog}': {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @api_app.get("/catalog/table-schema")
 async def get_table_schema(
+    request: Request,
     catalog: str,
     schema: str,
     table: str,
@@ -1106,25 +1815,28 @@ async def get_table_schema(
 ):
     """Get table schema (columns) for a specific table"""
     try:
-        logger.info(f"Getting schema for '{catalog}.{schema}.{table}' for user: {user.email}")
-        
-        table_info = client.tables.get(full_name=f"{catalog}.{schema}.{table}")
-        
-        columns = []
-        if table_info.columns:
-            for col in table_info.columns:
-                columns.append({
+        def load():
+            logger.info(f"Getting schema for '{catalog}.{schema}.{table}' for user: {user.email}")
+            
+            table_info = client.tables.get(full_name=f"{catalog}.{schema}.{table}")
+            
+            columns = [
+                {
                     "name": col.name,
                     "type": col.type_name.value if col.type_name else "STRING",
                     "comment": col.comment or "",
                     "nullable": col.nullable if col.nullable is not None else True
-                })
+                }
+                for col in table_info.columns or []
+            ]
+            
+            logger.info(f"Retrieved {len(columns)} columns for '{catalog}.{schema}.{table}'")
+            return {
+                "columns": columns,
+                "table_type": table_info.table_type.value if table_info.table_type else "TABLE"
+            }
         
-        logger.info(f"Retrieved {len(columns)} columns for '{catalog}.{schema}.{table}'")
-        return {
-            "columns": columns,
-            "table_type": table_info.table_type.value if table_info.table_type else "TABLE"
-        }
+        return await _cached_catalog_lookup(request, ("table-schema", user.email, catalog, schema, table), load)
         
     except Exception as e:
         logger.error(f"Failed to get schema for '{catalog}.{schema}.{table}': {e}", exc_info=True)
@@ -1197,51 +1909,28 @@ async def delete_dashboard(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# ============================================================================
-# AI Endpoints (Fix Authorization)
-# ============================================================================
+# Mount API app
+app.mount("/api", api_app)
 
-@api_app.post("/ai/suggest-visualization")
-async def suggest_visualization_with_ai_fixed(
-    request: dict,
-    user: UserContext = Depends(get_user_context),
-    client: WorkspaceClient = Depends(get_databricks_client)
-):
+# Serve static files (React build)
+class FrontendStaticFiles(StaticFiles):
     """
-    Suggest the best visualization type for given data and user question.
-    (Fixed version with proper auth)
+    StaticFiles with cache headers for a Vite build
+    
+    Files under assets/ have content hashes in their names, so browsers can keep
+    them forever without revalidating; index.html and other unhashed files must
+    be revalidated so new deploys are picked up.
     """
-    try:
-        logger.info(f"AI visualization suggestion for user: {user.email}")
-        
-        # TODO: Implement actual AI suggestion using Databricks Foundation Models
-        # For now, return a simple suggestion based on data shape
-        data_summary = request.get('data_summary', {})
-        user_question = request.get('user_question', '')
-        
-        # Simple heuristic-based suggestion
-        suggestion = {
-            "chart_type": "bar",
-            "reasoning": "Bar chart recommended for categorical comparisons",
-            "config": {
-                "xAxis": data_summary.get('columns', [''])[0] if data_summary.get('columns') else "",
-                "yAxis": data_summary.get('columns', ['', ''])[1] if len(data_summary.get('columns', [])) > 1 else "",
-                "aggregation": "SUM"
-            }
-        }
-        
-        logger.info(f"AI suggestion generated for user {user.email}")
-        return suggestion
-        
-    except Exception as e:
-        logger.error(f"Error suggesting visualization: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
-
+    
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if path.startswith("assets/"):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
 
-# Mount API app
-app.mount("/api", api_app)
 
-# Serve static files (React build)
 # Check for frontend build in multiple possible locations
 frontend_dir = None
 if os.path.exists("dist") and os.path.exists("dist/index.html"):
@@ -1252,7 +1941,12 @@ elif os.path.exists("client/build") and os.path.exists("client/build/index.html"
     logger.info("Serving frontend from client/build/ directory")
 
 if frontend_dir:
-    app.mount("/", StaticFiles(directory=frontend_dir, html=True), name="ui")
+    # Compress the UI only: gzip would buffer the API's streaming/SSE responses
+    app.mount(
+        "/",
+        GZipMiddleware(FrontendStaticFiles(directory=frontend_dir, html=True), minimum_size=1024),
+        name="ui"
+    )
     logger.info(f"Frontend mounted successfully from {frontend_dir}")
 else:
     logger.warning("Frontend not found - no dist/ or client/build/ directory with index.html")
@@ -1276,5 +1970,14 @@ else:
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Mirrors the production gunicorn setup (gunicorn.conf.py) for local runs
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", min(os.cpu_count() or 1, 4))),
+        timeout_keep_alive=30
+    )
 
@@ -9,16 +9,40 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional, Dict, Any
 from databricks.sdk import WorkspaceClient
 from databricks.sdk.core import Config
+import asyncio
 import os
+import hashlib
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from functools import lru_cache
+from cachetools import TTLCache
+import jwt
+from jwt import PyJWKClient
 
 logger = logging.getLogger(__name__)
 
 # Security scheme for Bearer token
 security = HTTPBearer(auto_error=False)
 
+# Databricks Apps' proxy sets verified X-Forwarded-* identity headers on every
+# request, so they are trusted by default only when running as an App
+TRUST_FORWARDED_HEADERS = os.getenv(
+    "TRUST_FORWARDED_HEADERS",
+    "true" if os.getenv("DATABRICKS_APP_NAME") else "false"
+) == "true"
+
+ADMIN_GROUPS = frozenset({"admins", "account admins", "workspace admins"})
+
+# Expected "aud" of user OAuth tokens: the app's OAuth client ID, which
+# Databricks Apps sets as DATABRICKS_CLIENT_ID. Without one, tokens aren't
+# trusted from their claims and every user is resolved through SCIM.
+OAUTH_TOKEN_AUDIENCE = os.getenv("DATABRICKS_OAUTH_AUDIENCE") or os.getenv("DATABRICKS_CLIENT_ID")
+
+# Local development without a token; the environment is fixed for the process
+DEV_MODE = os.getenv("DEV_MODE") == "true"
+DEV_USER_EMAIL = os.getenv("DEV_USER_EMAIL", "dev@example.com")
+
 
 class UserContext:
     """Represents authenticated user context"""
@@ -29,14 +53,24 @@ class UserContext:
         user_id: str,
         groups: list[str],
         is_admin: bool = False,
-        workspace_client: Optional[WorkspaceClient] = None
+        workspace_client: Optional[WorkspaceClient] = None,
+        groups_resolved: bool = True
     ):
         self.email = email
         self.user_id = user_id
         self.groups = groups
         self.is_admin = is_admin
         self.workspace_client = workspace_client
-        self.authenticated_at = datetime.utcnow()
+        # False when built from forwarded headers: groups/admin are fetched on demand
+        self.groups_resolved = groups_resolved
+        # Monotonic stamp for session age checks; wall time only for display
+        self._authenticated_mono = time.monotonic()
+        self._authenticated_wall = time.time()
+    
+    @property
+    def authenticated_at(self) -> datetime:
+        """UTC time the user was authenticated"""
+        return datetime.utcfromtimestamp(self._authenticated_wall)
     
     def has_group(self, group_name: str) -> bool:
         """Check if user belongs to a specific group"""
@@ -44,8 +78,7 @@ class UserContext:
     
     def is_session_valid(self, max_age_minutes: int = 60) -> bool:
         """Check if session is still valid"""
-        age = datetime.utcnow() - self.authenticated_at
-        return age < timedelta(minutes=max_age_minutes)
+        return time.monotonic() - self._authenticated_mono < max_age_minutes * 60
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for serialization"""
@@ -72,11 +105,17 @@ class AuthorizationError(HTTPException):
         super().__init__(status_code=403, detail=detail)
 
 
-def get_workspace_client_for_user(token: str) -> WorkspaceClient:
-    """
-    Create a WorkspaceClient with the user's OAuth token
-    This enables on-behalf-of operations
-    """
+# Shared dev-mode user, built once instead of per request
+_DEV_USER = UserContext(
+    email=DEV_USER_EMAIL,
+    user_id="dev-user-id",
+    groups=["users", "admins"],
+    is_admin=True
+)
+
+
+def _workspace_host() -> str:
+    """Workspace URL from the environment"""
     host = os.getenv("DATABRICKS_HOST")
     if not host:
         host = os.getenv("DATABRICKS_SERVER_HOSTNAME")
@@ -85,29 +124,147 @@ def get_workspace_client_for_user(token: str) -> WorkspaceClient:
     
     if not host:
         raise AuthenticationError("Databricks host not configured")
-    
+    return host.rstrip("/")
+
+
+def get_workspace_client_for_user(token: str) -> WorkspaceClient:
+    """
+    Create a WorkspaceClient with the user's OAuth token
+    This enables on-behalf-of operations
+    """
     # Create config with user's token
     config = Config(
-        host=host,
+        host=_workspace_host(),
         token=token
     )
     
     return WorkspaceClient(config=config)
 
 
+def _is_admin_groups(groups: list[str]) -> bool:
+    """Check whether any of the groups grants admin"""
+    return any(group.lower() in ADMIN_GROUPS for group in groups)
+
+
+def _user_from_forwarded_headers(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials]
+) -> Optional[UserContext]:
+    """
+    Build user context from the Databricks Apps identity headers
+    
+    Skips the current_user.me() round-trip; groups and admin status are left
+    unresolved until an endpoint needs them (see resolve_user_groups).
+    """
+    if not TRUST_FORWARDED_HEADERS:
+        return None
+    
+    email = request.headers.get("X-Forwarded-Email")
+    if not email:
+        return None
+    
+    token = credentials.credentials if credentials else request.headers.get("X-Forwarded-Access-Token")
+    return UserContext(
+        email=email,
+        user_id=request.headers.get("X-Forwarded-User") or email,
+        groups=[],
+        is_admin=False,
+        workspace_client=get_workspace_client_for_user(token) if token else None,
+        groups_resolved=False
+    )
+
+
+# Groups and admin status for header-authenticated users, keyed by email
+_groups_cache: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+
+
+async def resolve_user_groups(user: UserContext) -> UserContext:
+    """Fill in groups and admin status for a user built from forwarded headers"""
+    if user.groups_resolved:
+        return user
+    
+    resolved = _groups_cache.get(user.email)
+    if resolved is None:
+        groups = []
+        if user.workspace_client:
+            current_user = await asyncio.to_thread(user.workspace_client.current_user.me)
+            groups = [g.display for g in current_user.groups or []]
+        resolved = (groups, _is_admin_groups(groups))
+        _groups_cache[user.email] = resolved
+    
+    user.groups, user.is_admin = resolved
+    user.groups_resolved = True
+    return user
+
+
+@lru_cache(maxsize=1)
+def _get_jwks_client() -> PyJWKClient:
+    """Workspace OIDC signing keys, fetched on first use and cached for an hour"""
+    return PyJWKClient(f"{_workspace_host()}/oidc/jwks.json", cache_keys=True, lifespan=3600)
+
+
+def _user_from_jwt(token: str) -> Optional[UserContext]:
+    """
+    Build user context from a verified OAuth JWT without calling the workspace
+    
+    The token must be signed by the workspace, issued by its OIDC endpoint and
+    addressed to this app (OAUTH_TOKEN_AUDIENCE). Returns None when it isn't,
+    when no audience is configured, or when it lacks an email claim, so the
+    caller falls back to current_user.me(). Groups are resolved lazily
+    when the token doesn't carry them.
+    """
+    # Only a token issued for this app may stand in for the SCIM lookup
+    if not OAUTH_TOKEN_AUDIENCE:
+        return None
+    
+    try:
+        signing_key = _get_jwks_client().get_signing_key_from_jwt(token)
+        claims = jwt.decode(
+            token,
+            signing_key.key,
+            algorithms=["RS256"],
+            audience=OAUTH_TOKEN_AUDIENCE,
+            issuer=f"{_workspace_host()}/oidc",
+            options={"require": ["exp", "sub", "aud", "iss"]}
+        )
+    except jwt.PyJWTError as e:
+        logger.debug(f"Token not verifiable as JWT, falling back to SCIM: {str(e)}")
+        return None
+    
+    email = claims.get("email")
+    if not email:
+        return None
+    
+    groups = claims.get("groups")
+    return UserContext(
+        email=email,
+        user_id=claims["sub"],
+        groups=groups or [],
+        is_admin=_is_admin_groups(groups or []),
+        workspace_client=get_workspace_client_for_user(token),
+        groups_resolved=groups is not None
+    )
+
+
 async def extract_user_from_token(token: str) -> UserContext:
     """
     Extract user context from OAuth token
     
     In Databricks Apps, the OAuth token contains user identity.
-    This function validates the token and extracts user information.
+    This function validates the token and extracts user information,
+    from its JWT claims when possible and otherwise via current_user.me().
     """
+    # Signature check is local once the JWKS is cached; the first call fetches it
+    user = await asyncio.to_thread(_user_from_jwt, token)
+    if user:
+        return user
+    
     try:
         # Create workspace client with user's token
         client = get_workspace_client_for_user(token)
         
-        # Get current user information
-        current_user = client.current_user.me()
+        # Get current user information (blocking SCIM call, run off the event loop)
+        current_user = await asyncio.to_thread(client.current_user.me)
         
         # Extract user details
         email = current_user.user_name or current_user.emails[0].value if current_user.emails else "unknown"
@@ -119,10 +276,7 @@ async def extract_user_from_token(token: str) -> UserContext:
             groups = [g.display for g in current_user.groups]
         
         # Check if user is admin (workspace admin or in admin group)
-        is_admin = any(
-            group in ["admins", "account admins", "workspace admins"] 
-            for group in [g.lower() for g in groups]
-        )
+        is_admin = _is_admin_groups(groups)
         
         logger.info(f"Authenticated user: {email} (admin: {is_admin})")
         
@@ -151,25 +305,25 @@ async def get_user_context(
         async def protected_route(user: UserContext = Depends(get_user_context)):
             return {"user": user.email}
     """
+    # Trust the platform's identity headers when present
+    forwarded_user = _user_from_forwarded_headers(request, credentials)
+    if forwarded_user:
+        request.state.user = forwarded_user
+        return forwarded_user
+    
     # Check for token in Authorization header
     if not credentials:
         # Check if we're in dev mode with a test token
-        if os.getenv("DEV_MODE") == "true":
-            test_email = os.getenv("DEV_USER_EMAIL", "dev@example.com")
-            logger.warning(f"DEV MODE: Using test user {test_email}")
-            return UserContext(
-                email=test_email,
-                user_id="dev-user-id",
-                groups=["users", "admins"],
-                is_admin=True
-            )
+        if DEV_MODE:
+            logger.warning(f"DEV MODE: Using test user {DEV_USER_EMAIL}")
+            return _DEV_USER
         
         raise AuthenticationError("Missing authentication token")
     
     token = credentials.credentials
     
     # Extract user context from token
-    user_context = await extract_user_from_token(token)
+    user_context = await _extract_user_coalesced(token)
     
     # Validate session
     if not user_context.is_session_valid():
@@ -192,6 +346,7 @@ async def get_admin_user(
         async def admin_only(user: UserContext = Depends(get_admin_user)):
             return {"status": "admin access granted"}
     """
+    await resolve_user_groups(user)
     if not user.is_admin:
         raise AuthorizationError(
             f"Admin privileges required. User {user.email} is not an admin."
@@ -209,6 +364,7 @@ async def require_group(group_name: str):
             return {"data": "sensitive"}
     """
     async def check_group(user: UserContext = Depends(get_user_context)) -> UserContext:
+        await resolve_user_groups(user)
         if not user.has_group(group_name) and not user.is_admin:
             raise AuthorizationError(
                 f"Group '{group_name}' membership required. User {user.email} is not a member."
@@ -226,30 +382,45 @@ def get_user_from_request(request: Request) -> Optional[UserContext]:
 
 
 # Session cache for performance (in production, use Redis or similar)
-# This prevents re-validating the same token on every request
-_session_cache: Dict[str, tuple[UserContext, datetime]] = {}
+# This prevents re-validating the same token on every request. Entries are
+# keyed by a digest of the token so raw tokens aren't held in memory, and the
+# cache is bounded with monotonic-clock expiry. Reads and writes only happen
+# on the event loop with no await in between, so they need no lock.
 _cache_ttl_minutes = 5
+_session_cache: TTLCache = TTLCache(maxsize=10_000, ttl=_cache_ttl_minutes * 60)
+
+
+def _token_key(token: str) -> bytes:
+    """Cache key for a token"""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+# Token validations currently running, so concurrent requests with the same
+# token share one current_user.me() call instead of each making their own
+_in_flight: Dict[bytes, asyncio.Task] = {}
+
+
+async def _extract_user_coalesced(token: str) -> UserContext:
+    """Run extract_user_from_token once per token across concurrent callers"""
+    key = _token_key(token)
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(extract_user_from_token(token))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    
+    # Shield so one cancelled request doesn't fail the others waiting on it
+    return await asyncio.shield(task)
 
 
 def cache_user_session(token: str, user: UserContext):
     """Cache user session for performance"""
-    _session_cache[token] = (user, datetime.utcnow())
+    _session_cache[_token_key(token)] = user
 
 
 def get_cached_session(token: str) -> Optional[UserContext]:
     """Get cached user session if still valid"""
-    if token not in _session_cache:
-        return None
-    
-    user, cached_at = _session_cache[token]
-    age = datetime.utcnow() - cached_at
-    
-    if age < timedelta(minutes=_cache_ttl_minutes):
-        return user
-    
-    # Cache expired, remove it
-    del _session_cache[token]
-    return None
+    return _session_cache.get(_token_key(token))
 
 
 async def get_user_context_cached(
@@ -260,15 +431,14 @@ async def get_user_context_cached(
     Cached version of get_user_context for better performance
     Use this in high-traffic endpoints
     """
+    forwarded_user = _user_from_forwarded_headers(request, credentials)
+    if forwarded_user:
+        request.state.user = forwarded_user
+        return forwarded_user
+    
     if not credentials:
-        if os.getenv("DEV_MODE") == "true":
-            test_email = os.getenv("DEV_USER_EMAIL", "dev@example.com")
-            return UserContext(
-                email=test_email,
-                user_id="dev-user-id",
-                groups=["users", "admins"],
-                is_admin=True
-            )
+        if DEV_MODE:
+            return _DEV_USER
         raise AuthenticationError("Missing authentication token")
     
     token = credentials.credentials
@@ -280,7 +450,7 @@ async def get_user_context_cached(
         return cached_user
     
     # Not in cache, extract from token
-    user_context = await extract_user_from_token(token)
+    user_context = await _extract_user_coalesced(token)
     
     # Cache for future requests
     cache_user_session(token, user_context)
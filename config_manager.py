@@ -4,8 +4,27 @@ Reads data_config.yaml and provides mapped queries
 """
 
 import yaml
+import functools
+import glob
 import os
-from typing import Dict, List, Optional, Any
+import pickle
+import re
+import sys
+import tempfile
+from typing import Dict, List, Optional, Any, Tuple
+
+# libyaml's C loader parses several times faster; PyYAML wheels bundle it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+
+# Distinct (view, fields) SELECT prefixes kept by build_query
+SELECT_PREFIX_CACHE_SIZE = 256
+
+# {placeholder} tokens in custom queries
+_PLACEHOLDER_RE = re.compile(r'\{([^{}]+)\}')
 
 
 class DataConfig:
@@ -13,14 +32,33 @@ class DataConfig:
     
     def __init__(self, config_path: str = "data_config.yaml"):
         self.config_path = config_path
+        self._mapping_patterns: Dict[str, Tuple[Optional[re.Pattern], Dict[str, str]]] = {}
+        # Flat per-view lookups, filled from the config once it's validated
+        self._views: Dict[str, str] = {}
+        self._fqn: Dict[str, str] = {}
+        self._fmap: Dict[str, Dict[str, str]] = {}
+        self._select_prefixes: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        self._custom_queries: Dict[str, Optional[str]] = {}
         self.config = self._load_config()
         self._validate_config()
     
     def _load_config(self) -> Dict:
         """Load configuration from YAML file"""
+        # Lookups built from the previous config
+        self._mapping_patterns.clear()
+        self._views.clear()
+        self._fqn.clear()
+        self._fmap.clear()
+        self._select_prefixes.clear()
+        self._custom_queries.clear()
         try:
-            with open(self.config_path, 'r') as f:
-                config = yaml.safe_load(f)
+            st = os.stat(self.config_path)
+            sidecar = f"{self.config_path}.{st.st_mtime_ns}.{st.st_size}.pkl"
+            config = self._read_sidecar(sidecar)
+            if config is None:
+                with open(self.config_path, 'r') as f:
+                    config = yaml.load(f.read(), Loader=_YamlLoader)
+                self._write_sidecar(sidecar, config)
             print(f"[Config] Loaded configuration from {self.config_path}")
             return config
         except FileNotFoundError:
@@ -31,6 +69,44 @@ class DataConfig:
         except yaml.YAMLError as e:
             raise Exception(f"Invalid YAML in configuration file: {e}")
     
+    @staticmethod
+    def _read_sidecar(sidecar: str) -> Optional[Dict]:
+        """Load a previously parsed config; the name ties it to the YAML's mtime and size"""
+        try:
+            with open(sidecar, 'rb') as f:
+                config = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Truncated, or written by an incompatible version: parse the YAML instead
+            print(f"[Config] Ignoring unreadable cached configuration {sidecar}: {e}")
+            return None
+        return config if isinstance(config, dict) else None
+    
+    def _write_sidecar(self, sidecar: str, config: Dict):
+        """Cache the parsed config next to the YAML, replacing stale copies"""
+        tmp_path = None
+        try:
+            directory = os.path.dirname(sidecar) or "."
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(config, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, sidecar)
+            tmp_path = None
+            
+            for stale in glob.glob(f"{glob.escape(self.config_path)}.*.pkl"):
+                if stale != sidecar:
+                    os.remove(stale)
+        except Exception as e:
+            # Read-only deployments just parse the YAML each start
+            print(f"[Config] Could not cache parsed configuration: {e}")
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+    
     def _validate_config(self):
         """Validate required configuration sections exist"""
         required_sections = ['connection', 'views', 'field_mappings']
@@ -39,8 +115,22 @@ class DataConfig:
                 raise Exception(
                     f"Missing required section '{section}' in {self.config_path}"
                 )
+        self._index_config()
         print("[Config] Configuration validated successfully")
     
+    def _index_config(self):
+        """Flatten view names, table names and field mappings for the query builders"""
+        catalog, schema = self.catalog, self.schema
+        for view_key, view_config in self.config['views'].items():
+            if view_config:
+                self._views[view_key] = view_config['source']
+                self._fqn[view_key] = f"{catalog}.{schema}.{view_config['source']}"
+        
+        for view_key, mappings in self.config['field_mappings'].items():
+            if mappings:
+                self._fmap[view_key] = mappings
+                self._compiled_mapping(view_key)
+    
     # Connection Properties
     @property
     def catalog(self) -> str:
@@ -57,22 +147,26 @@ class DataConfig:
     # View Name Getters
     def get_view_name(self, view_key: str) -> str:
         """Get the actual view/table name for a logical view key"""
-        view_config = self.config['views'].get(view_key)
-        if not view_config:
+        view_name = self._views.get(view_key)
+        if view_name is None:
             raise Exception(f"View '{view_key}' not configured in data_config.yaml")
-        return view_config['source']
+        return view_name
     
     def get_full_table_name(self, view_key: str) -> str:
         """Get fully qualified table name: catalog.schema.table"""
-        view_name = self.get_view_name(view_key)
-        return f"{self.catalog}.{self.schema}.{view_name}"
+        full_name = self._fqn.get(view_key)
+        if full_name is None:
+            # Raises for an unconfigured view
+            self.get_view_name(view_key)
+        return full_name
     
     # Field Mapping
     def get_field_mapping(self, view_key: str) -> Dict[str, str]:
         """Get field mappings for a specific view"""
-        mappings = self.config['field_mappings'].get(view_key, {})
-        if not mappings:
+        mappings = self._fmap.get(view_key)
+        if mappings is None:
             print(f"[Warning] No field mappings found for '{view_key}', using default field names")
+            mappings = self._fmap[view_key] = {}
         return mappings
     
     def map_field(self, view_key: str, dashboard_field: str) -> str:
@@ -91,19 +185,15 @@ class DataConfig:
         Returns:
             SQL SELECT clause with mapped field names
         """
-        mapping = self.get_field_mapping(view_key)
-        select_parts = []
+        # Only renamed fields need an alias
+        _, renamed = self._compiled_mapping(view_key)
+        if not renamed:
+            return ", ".join(fields)
         
-        for field in fields:
-            actual_field = mapping.get(field, field)
-            if actual_field != field:
-                # Field name is different, use alias
-                select_parts.append(f"{actual_field} as {field}")
-            else:
-                # Field name matches, no alias needed
-                select_parts.append(field)
-        
-        return ", ".join(select_parts)
+        return ", ".join(
+            f"{renamed[field]} as {field}" if field in renamed else field
+            for field in fields
+        )
     
     def build_query(self, view_key: str, fields: List[str], 
                    where: Optional[str] = None, 
@@ -122,10 +212,7 @@ class DataConfig:
         Returns:
             Complete SQL query string
         """
-        table_name = self.get_full_table_name(view_key)
-        select_clause = self.build_select_clause(view_key, fields)
-        
-        query = f"SELECT {select_clause} FROM {table_name}"
+        query = self._select_prefix(view_key, tuple(fields))
         
         if where:
             # Map field names in WHERE clause
@@ -142,35 +229,76 @@ class DataConfig:
         
         return query
     
+    def _select_prefix(self, view_key: str, fields: Tuple[str, ...]) -> str:
+        """Get the 'SELECT ... FROM table' part of a query, built once per view and field list"""
+        key = (view_key, fields)
+        prefix = self._select_prefixes.get(key)
+        if prefix is None:
+            table_name = self.get_full_table_name(view_key)
+            select_clause = self.build_select_clause(view_key, list(fields))
+            prefix = f"SELECT {select_clause} FROM {table_name}"
+            # Dashboards use a handful of field lists; reset if callers vary them freely
+            if len(self._select_prefixes) >= SELECT_PREFIX_CACHE_SIZE:
+                self._select_prefixes.clear()
+            self._select_prefixes[key] = prefix
+        return prefix
+    
+    def _compiled_mapping(self, view_key: str) -> Tuple[Optional[re.Pattern], Dict[str, str]]:
+        """
+        Get a single regex matching every renamed field of a view, plus its lookup
+        
+        Built once per view; matches whole field names only, so one field name
+        inside another isn't rewritten.
+        """
+        compiled = self._mapping_patterns.get(view_key)
+        if compiled is None:
+            lookup = {
+                dashboard_field: actual_field
+                for dashboard_field, actual_field in self.get_field_mapping(view_key).items()
+                if dashboard_field != actual_field
+            }
+            pattern = None
+            if lookup:
+                # Longest first so overlapping names prefer the full match
+                alternatives = '|'.join(re.escape(f) for f in sorted(lookup, key=len, reverse=True))
+                pattern = re.compile(rf'\b({alternatives})\b')
+            compiled = (pattern, lookup)
+            self._mapping_patterns[view_key] = compiled
+        return compiled
+    
     def _map_fields_in_clause(self, view_key: str, clause: str) -> str:
         """Helper to map dashboard field names in WHERE/ORDER BY clauses"""
-        mapping = self.get_field_mapping(view_key)
-        mapped_clause = clause
+        pattern, lookup = self._compiled_mapping(view_key)
+        if pattern is None:
+            return clause
         
-        # Replace each dashboard field with actual field name
-        for dashboard_field, actual_field in mapping.items():
-            if dashboard_field != actual_field:
-                # Only replace if field names are different
-                mapped_clause = mapped_clause.replace(dashboard_field, actual_field)
-        
-        return mapped_clause
+        # Replace each dashboard field with actual field name in one pass
+        return pattern.sub(lambda m: lookup[m.group(1)], clause)
     
     def get_custom_query(self, view_key: str) -> Optional[str]:
-        """Get a custom SQL query if defined"""
+        """Get a custom SQL query if defined (rendered once per view)"""
+        if view_key not in self._custom_queries:
+            self._custom_queries[view_key] = self._render_custom_query(view_key)
+        return self._custom_queries[view_key]
+    
+    def _render_custom_query(self, view_key: str) -> Optional[str]:
+        """Fill in a custom query's placeholders"""
         custom_queries = self.config.get('custom_queries', {})
         if not custom_queries.get('enabled', False):
             return None
         
         query = custom_queries.get(view_key)
         if query:
-            # Replace placeholders
-            mapping = self.get_field_mapping(view_key)
-            query = query.replace('{catalog}', self.catalog)
-            query = query.replace('{schema}', self.schema)
-            
-            # Replace field placeholders
-            for dashboard_field, actual_field in mapping.items():
-                query = query.replace(f'{{{dashboard_field}}}', actual_field)
+            # Replace {catalog}, {schema} and field placeholders in one pass
+            replacements = {
+                **self.get_field_mapping(view_key),
+                'catalog': self.catalog,
+                'schema': self.schema
+            }
+            query = _PLACEHOLDER_RE.sub(
+                lambda m: replacements.get(m.group(1), m.group(0)),
+                query
+            )
         
         return query
     
@@ -223,14 +351,20 @@ class DataConfig:
         print("="*60 + "\n")
 
 
-# Global config instance
-_config_instance = None
+# Print the configuration summary at startup outside an interactive terminal too
+CONFIG_VERBOSE = bool(os.getenv("CONFIG_VERBOSE"))
+
+
+@functools.cache
+def _build_config(config_path: str = "data_config.yaml") -> DataConfig:
+    """Load a configuration file once per process"""
+    config = DataConfig(config_path)
+    if CONFIG_VERBOSE or sys.stdout.isatty():
+        config.print_config_summary()
+    return config
+
 
 def get_config() -> DataConfig:
     """Get or create the global configuration instance"""
-    global _config_instance
-    if _config_instance is None:
-        _config_instance = DataConfig()
-        _config_instance.print_config_summary()
-    return _config_instance
+    return _build_config()
 
@@ -3,19 +3,41 @@ Configuration Service - Loads configuration from Unity Catalog tables
 Replaces the YAML-based config_manager.py
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Iterator, List, Optional, Any
 from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.sql import StatementState
+from databricks.sdk.service.sql import StatementParameterListItem, StatementState
 from dataclasses import dataclass
-from datetime import datetime, timedelta
 import json
 import logging
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+from cachetools import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Bound on cached config lookups; per-id and per-key entries would otherwise
+# grow with every distinct query id or system_config key requested
+CONFIG_CACHE_MAX_ENTRIES = 1024
 
-@dataclass
+# ${param_name} placeholders in query templates
+_TEMPLATE_PARAM_RE = re.compile(r'\$\{([A-Za-z_]\w*)\}')
+
+
+def _json_column(row: Dict[str, Any], key: str, default: Any = None) -> Any:
+    """Read an ARRAY/MAP/STRUCT column, which the statement API returns as JSON text"""
+    value = row.get(key)
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+@dataclass(slots=True)
 class QueryConfig:
     """Represents a configured dashboard query"""
     id: str
@@ -31,9 +53,28 @@ class QueryConfig:
     cache_ttl_seconds: int
     tags: List[str]
     is_active: bool
+    
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "QueryConfig":
+        """Build from a dashboard_queries row"""
+        return cls(
+            id=row['id'],
+            name=row['name'],
+            description=row.get('description'),
+            category=row['category'],
+            sql_template=row['sql_template'],
+            parameters=_json_column(row, 'parameters', []),
+            output_schema=_json_column(row, 'output_schema', []),
+            required_permissions=_json_column(row, 'required_permissions', []),
+            allow_drill_down=row.get('allow_drill_down', False),
+            drill_down_query_id=row.get('drill_down_query_id'),
+            cache_ttl_seconds=row.get('cache_ttl_seconds', 300),
+            tags=_json_column(row, 'tags', []),
+            is_active=row.get('is_active', True)
+        )
 
 
-@dataclass
+@dataclass(slots=True)
 class FilterConfig:
     """Represents a filter configuration"""
     id: str
@@ -51,9 +92,30 @@ class FilterConfig:
     display_order: int
     is_required: bool
     is_active: bool
+    
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "FilterConfig":
+        """Build from a filter_definitions row"""
+        return cls(
+            id=row['id'],
+            filter_name=row['filter_name'],
+            label=row['label'],
+            filter_type=row['filter_type'],
+            data_type=row['data_type'],
+            data_source=row['data_source'],
+            static_options=_json_column(row, 'static_options', []),
+            options_query=row.get('options_query'),
+            default_value=row.get('default_value'),
+            applies_to_tabs=_json_column(row, 'applies_to_tabs', []),
+            applies_to_queries=_json_column(row, 'applies_to_queries', []),
+            filter_expression_template=row.get('filter_expression_template'),
+            display_order=row.get('display_order', 0),
+            is_required=row.get('is_required', False),
+            is_active=row.get('is_active', True)
+        )
 
 
-@dataclass
+@dataclass(slots=True)
 class VisualizationConfig:
     """Represents a visualization configuration"""
     id: str
@@ -72,6 +134,28 @@ class VisualizationConfig:
     default_for_tab: Optional[str]
     display_order: int
     is_active: bool
+    
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "VisualizationConfig":
+        """Build from a visualization_configs row"""
+        return cls(
+            id=row['id'],
+            viz_name=row['viz_name'],
+            viz_type=row['viz_type'],
+            query_id=row['query_id'],
+            data_key=row['data_key'],
+            x_axis_field=row.get('x_axis_field'),
+            y_axis_field=row.get('y_axis_field'),
+            color_scheme=_json_column(row, 'color_scheme', []),
+            title=row.get('title'),
+            subtitle=row.get('subtitle'),
+            allow_drill_down=row.get('allow_drill_down', False),
+            drill_down_config=_json_column(row, 'drill_down_config'),
+            chart_options=_json_column(row, 'chart_options', {}),
+            default_for_tab=row.get('default_for_tab'),
+            display_order=row.get('display_order', 0),
+            is_active=row.get('is_active', True)
+        )
 
 
 class ConfigService:
@@ -90,137 +174,145 @@ class ConfigService:
         self.config_catalog = config_catalog
         self.config_schema = config_schema
         self.warehouse_id = warehouse_id
-        self._cache: Dict[str, tuple[Any, datetime]] = {}
-        self._cache_ttl = timedelta(minutes=5)
+        # Parsed configs by lookup key; accessed from the SDK thread pool, hence the lock.
+        # Expiry runs on the monotonic clock, so wall-clock jumps don't affect it.
+        self._cache_ttl_seconds = 300.0
+        self._cache: TTLCache = TTLCache(
+            maxsize=CONFIG_CACHE_MAX_ENTRIES,
+            ttl=self._cache_ttl_seconds,
+            timer=time.monotonic
+        )
+        self._cache_lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
     
     def _get_full_table_name(self, table: str) -> str:
         """Get fully qualified table name"""
         return f"{self.config_catalog}.{self.config_schema}.{table}"
     
-    def _execute_query(self, sql: str) -> List[Dict[str, Any]]:
-        """Execute SQL query and return results"""
+    def _execute_query_iter(
+        self,
+        sql: str,
+        parameters: Optional[Dict[str, str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Execute SQL query, binding :name markers from parameters, and yield result rows
+        
+        Rows are yielded one result chunk at a time and later chunks are only
+        fetched as the caller reads, so a caller that stops early never
+        downloads them.
+        """
         try:
             response = self.client.statement_execution.execute_statement(
                 warehouse_id=self.warehouse_id,
                 statement=sql,
                 catalog=self.config_catalog,
                 schema=self.config_schema,
+                parameters=[
+                    StatementParameterListItem(name=name, value=value)
+                    for name, value in (parameters or {}).items()
+                ] or None,
                 wait_timeout="30s"
             )
             
             if response.status.state != StatementState.SUCCEEDED:
                 raise Exception(f"Query failed: {response.status.state}")
             
-            if not response.result or not response.result.data_array:
-                return []
-            
-            columns = [col.name for col in response.manifest.schema.columns]
-            
-            results = []
-            for row in response.result.data_array:
-                row_dict = {}
-                for i, value in enumerate(row):
-                    if i < len(columns):
-                        row_dict[columns[i]] = value
-                results.append(row_dict)
+            if not response.manifest or not response.manifest.schema:
+                return
             
-            return results
+            # Interned so every row dict shares the same key objects
+            columns = tuple(sys.intern(col.name) for col in response.manifest.schema.columns)
+            result = response.result
+            while result is not None:
+                for row in result.data_array or ():
+                    yield dict(zip(columns, row))
+                
+                if result.next_chunk_index is None:
+                    break
+                result = self.client.statement_execution.get_statement_result_chunk_n(
+                    response.statement_id,
+                    result.next_chunk_index
+                )
             
         except Exception as e:
             logger.error(f"Query execution failed: {str(e)}")
             raise
     
+    def _execute_query(
+        self,
+        sql: str,
+        parameters: Optional[Dict[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Execute SQL query and return all result rows"""
+        return list(self._execute_query_iter(sql, parameters))
+    
     def _get_cached(self, key: str) -> Optional[Any]:
         """Get cached value if still valid"""
-        if key in self._cache:
-            value, cached_at = self._cache[key]
-            if datetime.utcnow() - cached_at < self._cache_ttl:
-                return value
-            else:
-                del self._cache[key]
-        return None
+        with self._cache_lock:
+            return self._cache.get(key)
     
     def _set_cached(self, key: str, value: Any):
         """Cache a value"""
-        self._cache[key] = (value, datetime.utcnow())
+        with self._cache_lock:
+            self._cache[key] = value
+    
+    def _get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        Get a cached value, running loader on a miss
+        
+        Concurrent misses for the same key wait for the first caller's load
+        instead of each querying the warehouse. None results aren't cached.
+        """
+        value = self._get_cached(key)
+        if value is not None:
+            return value
+        
+        with self._cache_lock:
+            key_lock = self._load_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self._get_cached(key)
+            if value is None:
+                value = loader()
+                if value is not None:
+                    self._set_cached(key, value)
+        with self._cache_lock:
+            self._load_locks.pop(key, None)
+        return value
     
     def get_query_config(self, query_id: str) -> Optional[QueryConfig]:
         """Get configuration for a specific query"""
-        cache_key = f"query_{query_id}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
-        
+        return self._get_or_load(f"query_{query_id}", lambda: self._load_query_config(query_id))
+    
+    def _load_query_config(self, query_id: str) -> Optional[QueryConfig]:
+        """Load one active query configuration"""
         sql = f"""
             SELECT *
             FROM {self._get_full_table_name('dashboard_queries')}
-            WHERE id = '{query_id}' AND is_active = true
+            WHERE id = :query_id AND is_active = true
         """
         
-        results = self._execute_query(sql)
-        if not results:
-            return None
-        
-        row = results[0]
-        config = QueryConfig(
-            id=row['id'],
-            name=row['name'],
-            description=row.get('description'),
-            category=row['category'],
-            sql_template=row['sql_template'],
-            parameters=row.get('parameters', []),
-            output_schema=row.get('output_schema', []),
-            required_permissions=row.get('required_permissions', []),
-            allow_drill_down=row.get('allow_drill_down', False),
-            drill_down_query_id=row.get('drill_down_query_id'),
-            cache_ttl_seconds=row.get('cache_ttl_seconds', 300),
-            tags=row.get('tags', []),
-            is_active=row.get('is_active', True)
-        )
-        
-        self._set_cached(cache_key, config)
-        return config
+        row = next(self._execute_query_iter(sql, {"query_id": query_id}), None)
+        return QueryConfig.from_row(row) if row is not None else None
     
     def get_all_queries(self, category: Optional[str] = None) -> List[QueryConfig]:
         """Get all active query configurations"""
-        cache_key = f"queries_{category or 'all'}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        configs = self._get_or_load("queries_all", self._load_all_queries)
         
+        # One cached list per table; subsets are filtered on read
+        if category:
+            return [config for config in configs if config.category == category]
+        return configs
+    
+    def _load_all_queries(self) -> List[QueryConfig]:
+        """Load every active query configuration"""
         sql = f"""
             SELECT *
             FROM {self._get_full_table_name('dashboard_queries')}
             WHERE is_active = true
+            ORDER BY name
         """
         
-        if category:
-            sql += f" AND category = '{category}'"
-        
-        sql += " ORDER BY name"
-        
-        results = self._execute_query(sql)
-        configs = [
-            QueryConfig(
-                id=row['id'],
-                name=row['name'],
-                description=row.get('description'),
-                category=row['category'],
-                sql_template=row['sql_template'],
-                parameters=row.get('parameters', []),
-                output_schema=row.get('output_schema', []),
-                required_permissions=row.get('required_permissions', []),
-                allow_drill_down=row.get('allow_drill_down', False),
-                drill_down_query_id=row.get('drill_down_query_id'),
-                cache_ttl_seconds=row.get('cache_ttl_seconds', 300),
-                tags=row.get('tags', []),
-                is_active=row.get('is_active', True)
-            )
-            for row in results
-        ]
-        
-        self._set_cached(cache_key, configs)
-        return configs
+        return [QueryConfig.from_row(row) for row in self._execute_query_iter(sql)]
     
     def get_filter_configs(
         self,
@@ -228,127 +320,125 @@ class ConfigService:
         tab: Optional[str] = None
     ) -> List[FilterConfig]:
         """Get filter configurations"""
-        cache_key = f"filters_{filter_type or 'all'}_{tab or 'all'}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        configs, by_type, by_tab = self._get_or_load("filters_all", self._load_filter_index)
         
+        if filter_type and tab:
+            # Intersect the smaller list with the other index, keeping display order
+            type_matches, tab_matches = by_type.get(filter_type, []), by_tab.get(tab, [])
+            if len(type_matches) > len(tab_matches):
+                return [config for config in tab_matches if config.filter_type == filter_type]
+            return [config for config in type_matches if tab in config.applies_to_tabs]
+        if filter_type:
+            return by_type.get(filter_type, [])
+        if tab:
+            return by_tab.get(tab, [])
+        return configs
+    
+    def _load_filter_index(self) -> tuple[List[FilterConfig], Dict[str, List[FilterConfig]], Dict[str, List[FilterConfig]]]:
+        """Load every active filter, indexed by filter type and by tab"""
+        configs = self._load_all_filters()
+        by_type: Dict[str, List[FilterConfig]] = {}
+        by_tab: Dict[str, List[FilterConfig]] = {}
+        for config in configs:
+            by_type.setdefault(config.filter_type, []).append(config)
+            for tab in dict.fromkeys(config.applies_to_tabs):
+                by_tab.setdefault(tab, []).append(config)
+        return configs, by_type, by_tab
+    
+    def _load_all_filters(self) -> List[FilterConfig]:
+        """Load every active filter configuration"""
         sql = f"""
             SELECT *
             FROM {self._get_full_table_name('filter_definitions')}
             WHERE is_active = true
+            ORDER BY display_order, filter_name
         """
         
-        if filter_type:
-            sql += f" AND filter_type = '{filter_type}'"
-        
-        sql += " ORDER BY display_order, filter_name"
-        
-        results = self._execute_query(sql)
-        
-        configs = []
-        for row in results:
-            # Filter by tab if specified
-            if tab and tab not in row.get('applies_to_tabs', []):
-                continue
-            
-            configs.append(FilterConfig(
-                id=row['id'],
-                filter_name=row['filter_name'],
-                label=row['label'],
-                filter_type=row['filter_type'],
-                data_type=row['data_type'],
-                data_source=row['data_source'],
-                static_options=row.get('static_options', []),
-                options_query=row.get('options_query'),
-                default_value=row.get('default_value'),
-                applies_to_tabs=row.get('applies_to_tabs', []),
-                applies_to_queries=row.get('applies_to_queries', []),
-                filter_expression_template=row.get('filter_expression_template'),
-                display_order=row.get('display_order', 0),
-                is_required=row.get('is_required', False),
-                is_active=row.get('is_active', True)
-            ))
-        
-        self._set_cached(cache_key, configs)
-        return configs
+        return [FilterConfig.from_row(row) for row in self._execute_query_iter(sql)]
     
     def get_viz_configs(self, tab: Optional[str] = None) -> List[VisualizationConfig]:
         """Get visualization configurations"""
-        cache_key = f"viz_{tab or 'all'}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        configs = self._get_or_load("viz_all", self._load_all_viz)
         
+        if tab:
+            return [config for config in configs if config.default_for_tab == tab]
+        return configs
+    
+    def _load_all_viz(self) -> List[VisualizationConfig]:
+        """Load every active visualization configuration"""
         sql = f"""
             SELECT *
             FROM {self._get_full_table_name('visualization_configs')}
             WHERE is_active = true
+            ORDER BY display_order, viz_name
         """
         
-        if tab:
-            sql += f" AND default_for_tab = '{tab}'"
-        
-        sql += " ORDER BY display_order, viz_name"
-        
-        results = self._execute_query(sql)
-        configs = [
-            VisualizationConfig(
-                id=row['id'],
-                viz_name=row['viz_name'],
-                viz_type=row['viz_type'],
-                query_id=row['query_id'],
-                data_key=row['data_key'],
-                x_axis_field=row.get('x_axis_field'),
-                y_axis_field=row.get('y_axis_field'),
-                color_scheme=row.get('color_scheme', []),
-                title=row.get('title'),
-                subtitle=row.get('subtitle'),
-                allow_drill_down=row.get('allow_drill_down', False),
-                drill_down_config=row.get('drill_down_config'),
-                chart_options=row.get('chart_options', {}),
-                default_for_tab=row.get('default_for_tab'),
-                display_order=row.get('display_order', 0),
-                is_active=row.get('is_active', True)
-            )
-            for row in results
-        ]
-        
-        self._set_cached(cache_key, configs)
-        return configs
+        return [VisualizationConfig.from_row(row) for row in self._execute_query_iter(sql)]
     
     def get_system_config(self, key: str, default: Any = None) -> Any:
         """Get system configuration value"""
-        cache_key = f"system_config_{key}"
-        cached = self._get_cached(cache_key)
-        if cached is not None:
-            return cached
-        
+        value = self._get_or_load(f"system_config_{key}", lambda: self._load_system_config(key))
+        return default if value is None else value
+    
+    def _load_system_config(self, key: str) -> Any:
+        """Load one system configuration value, or None if it isn't set"""
         sql = f"""
             SELECT config_value, config_type
             FROM {self._get_full_table_name('system_config')}
-            WHERE config_key = '{key}'
+            WHERE config_key = :config_key
         """
         
-        results = self._execute_query(sql)
-        if not results:
-            return default
-        
-        row = results[0]
-        value = row['config_value']
-        config_type = row['config_type']
-        
-        # Convert value to appropriate type
+        row = next(self._execute_query_iter(sql, {"config_key": key}), None)
+        if row is None:
+            return None
+        return self._convert_config_value(row['config_value'], row['config_type'])
+    
+    @staticmethod
+    def _convert_config_value(value: Any, config_type: str) -> Any:
+        """Convert a system_config value to its declared type"""
         if config_type == 'int':
-            value = int(value)
+            return int(value)
         elif config_type == 'boolean':
-            value = value.lower() == 'true'
+            return value.lower() == 'true'
         elif config_type == 'json':
-            value = json.loads(value)
-        
-        self._set_cached(cache_key, value)
+            return json.loads(value)
         return value
     
+    def prefetch_all(self):
+        """
+        Warm the cache with every active query, filter, visualization and system setting
+        
+        The four config tables are read in parallel, so the first dashboard load
+        doesn't pay for them one after another.
+        """
+        def load_system_config():
+            sql = f"""
+                SELECT config_key, config_value, config_type
+                FROM {self._get_full_table_name('system_config')}
+            """
+            for row in self._execute_query_iter(sql):
+                value = self._convert_config_value(row['config_value'], row['config_type'])
+                self._set_cached(f"system_config_{row['config_key']}", value)
+        
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="config-prefetch") as executor:
+            futures = {
+                "queries": executor.submit(self.get_all_queries),
+                "filters": executor.submit(self.get_filter_configs),
+                "visualizations": executor.submit(self.get_viz_configs),
+                "system_config": executor.submit(load_system_config)
+            }
+        
+        for name, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning(f"Failed to prefetch {name} configuration: {str(e)}")
+        
+        # Single-query lookups are answered from the full list
+        if futures["queries"].exception() is None:
+            for config in futures["queries"].result():
+                self._set_cached(f"query_{config.id}", config)
+    
     def build_query_from_template(
         self,
         query_id: str,
@@ -368,9 +458,7 @@ class ConfigService:
         if not config:
             raise ValueError(f"Query configuration not found: {query_id}")
         
-        sql = config.sql_template
-        
-        # Substitute parameters using ${param_name} syntax
+        values = {}
         for param_def in config.parameters:
             param_name = param_def['name']
             param_value = params.get(param_name)
@@ -381,30 +469,46 @@ class ConfigService:
                     raise ValueError(f"Required parameter missing: {param_name}")
                 param_value = param_def.get('default_value')
             
-            # Substitute in SQL
             if param_value is not None:
-                sql = sql.replace(f"${{{param_name}}}", str(param_value))
+                values[param_name] = str(param_value)
         
-        return sql
+        # Substitute parameters using ${param_name} syntax in one pass
+        return _TEMPLATE_PARAM_RE.sub(
+            lambda m: values.get(m.group(1), m.group(0)),
+            config.sql_template
+        )
     
     def clear_cache(self):
         """Clear configuration cache"""
-        self._cache.clear()
+        with self._cache_lock:
+            self._cache.clear()
     
     def validate_config_tables_exist(self) -> bool:
         """Validate that all configuration tables exist"""
-        required_tables = [
+        required_tables = {
             'dashboard_queries',
             'filter_definitions',
             'visualization_configs',
             'dashboard_tabs',
             'system_config'
-        ]
+        }
         
         try:
-            for table in required_tables:
-                sql = f"SELECT COUNT(*) as cnt FROM {self._get_full_table_name(table)} LIMIT 1"
-                self._execute_query(sql)
+            # One information_schema lookup instead of a probe query per table
+            table_list = ", ".join(f"'{table}'" for table in sorted(required_tables))
+            sql = f"""
+                SELECT table_name
+                FROM {self.config_catalog}.information_schema.tables
+                WHERE table_schema = :schema AND table_name IN ({table_list})
+            """
+            results = self._execute_query(sql, {"schema": self.config_schema})
+            found = {row['table_name'] for row in results}
+            
+            missing = required_tables - found
+            for table in sorted(missing):
+                logger.error(f"Configuration table not found: {self._get_full_table_name(table)}")
+            if missing:
+                return False
             
             logger.info("All configuration tables exist and are accessible")
             return True
@@ -416,6 +520,7 @@ class ConfigService:
 
 # Global config service instance
 _config_service: Optional[ConfigService] = None
+_config_service_lock = threading.Lock()
 
 
 def get_config_service(
@@ -426,15 +531,22 @@ def get_config_service(
 ) -> ConfigService:
     """Get or create global configuration service instance"""
     global _config_service
-    if _config_service is None:
-        _config_service = ConfigService(
-            workspace_client,
-            config_catalog,
-            config_schema,
-            warehouse_id
-        )
-        # Validate tables exist
-        if not _config_service.validate_config_tables_exist():
-            logger.warning("Configuration tables may not be properly set up")
+    if _config_service is not None:
+        return _config_service
+    
+    with _config_service_lock:
+        if _config_service is None:
+            service = ConfigService(
+                workspace_client,
+                config_catalog,
+                config_schema,
+                warehouse_id
+            )
+            # Validate tables exist
+            if not service.validate_config_tables_exist():
+                logger.warning("Configuration tables may not be properly set up")
+            else:
+                service.prefetch_all()
+            _config_service = service
     
     return _config_service
@@ -7,6 +7,7 @@ from typing import Dict, Any, List, Optional
 from databricks.sdk import WorkspaceClient
 from auth_middleware import UserContext
 import logging
+import threading
 from datetime import datetime
 import uuid
 
@@ -47,6 +48,7 @@ class GenieService:
         if not space:
             raise ValueError("No Genie space ID provided")
         
+        timestamp = datetime.utcnow().isoformat()
         try:
             # Use user's workspace client for on-behalf-of execution
             client = user_context.workspace_client if user_context else self.client
@@ -72,7 +74,7 @@ class GenieService:
                 "sql_executed": response.get("sql", ""),
                 "data": response.get("data", []),
                 "visualizations": response.get("suggested_viz", []),
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": timestamp,
                 "user_email": user_context.email if user_context else "unknown"
             }
             
@@ -82,7 +84,7 @@ class GenieService:
                 "success": False,
                 "error": str(e),
                 "question": question,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": timestamp
             }
     
     async def _call_genie(
@@ -173,6 +175,7 @@ class GenieService:
 
 # Global Genie service instance
 _genie_service: Optional[GenieService] = None
+_genie_service_lock = threading.Lock()
 
 
 def get_genie_service(
@@ -181,6 +184,10 @@ def get_genie_service(
 ) -> GenieService:
     """Get or create global Genie service instance"""
     global _genie_service
-    if _genie_service is None:
-        _genie_service = GenieService(workspace_client, default_space_id)
+    if _genie_service is not None:
+        return _genie_service
+    
+    with _genie_service_lock:
+        if _genie_service is None:
+            _genie_service = GenieService(workspace_client, default_space_id)
     return _genie_service
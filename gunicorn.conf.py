@@ -0,0 +1,17 @@
+"""
+Gunicorn settings for the Databricks App
+
+uvicorn[standard] ships uvloop and httptools, and UvicornWorker picks both up
+automatically. Each worker is a separate process with its own event loop and
+WorkspaceClient.
+"""
+
+import multiprocessing
+import os
+
+# One async worker per core handles the I/O-bound proxying; capped at 4
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 4)))
+
+# Passed through to uvicorn's timeout_keep_alive; the 2s default drops idle
+# dashboard connections between polls
+keepalive = 30
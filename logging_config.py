@@ -12,14 +12,27 @@ Features:
 - Error tracking with context
 """
 
+import asyncio
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
-import json
-from datetime import datetime
-from typing import Any, Dict, Optional
+import orjson
+from typing import Any, Dict, Iterator, Optional
 import os
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import wraps
 import time
+import copy
+
+# Binary stdout buffer for JSON logs and the longest a line may sit in it
+LOG_BUFFER_SIZE = 65536
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', '0.1'))
+
+# Records waiting for the background log thread
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
 
 
 class ColoredFormatter(logging.Formatter):
@@ -36,33 +49,79 @@ class ColoredFormatter(logging.Formatter):
         'BOLD': '\033[1m',        # Bold
     }
     
+    # Colored, padded level names, built once
+    LEVEL_PREFIXES = {}
+    for _level in ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'):
+        LEVEL_PREFIXES[_level] = f"{COLORS['BOLD']}{COLORS[_level]}{_level:8}{COLORS['RESET']}"
+    del _level
+    
     def format(self, record: logging.LogRecord) -> str:
         # Add color to level name
-        levelname = record.levelname
-        if levelname in self.COLORS:
-            record.levelname = (
-                f"{self.COLORS['BOLD']}{self.COLORS[levelname]}"
-                f"{levelname:8}"
-                f"{self.COLORS['RESET']}"
-            )
+        record.levelname = self.LEVEL_PREFIXES.get(record.levelname, record.levelname)
         
         # Format the message
         formatted = super().format(record)
         
         # Add extra context if available
         if hasattr(record, 'context') and record.context:
-            context_str = json.dumps(record.context, indent=2)
+            context_str = orjson.dumps(record.context, option=orjson.OPT_INDENT_2, default=str).decode()
             formatted += f"\n  Context: {context_str}"
         
         return formatted
 
 
+def _format_exception(formatter: logging.Formatter, exc_info) -> str:
+    """
+    Traceback text for exc_info, remembered on the exception instance
+    
+    Retry loops often log the same exception more than once; the text is
+    reused as long as the traceback hasn't grown since it was formatted.
+    """
+    exc, tb = exc_info[1], exc_info[2]
+    cached = getattr(exc, '_log_traceback', None)
+    if cached is not None and cached[0] is tb:
+        return cached[1]
+    text = formatter.formatException(exc_info)
+    try:
+        exc._log_traceback = (tb, text)
+    except AttributeError:
+        pass
+    return text
+
+
+# Optional record attributes (set via extra=) and their JSON keys
+_EXTRA_FIELDS = (
+    ('context', 'context'),
+    ('user_email', 'user'),
+    ('request_id', 'request_id'),
+    ('duration_ms', 'duration_ms'),
+    ('audit', 'audit'),
+)
+_MISSING = object()
+
+
 class JSONFormatter(logging.Formatter):
     """JSON formatter for production logging"""
     
+    # (whole second, its formatted UTC prefix); one tuple so threads swap it atomically
+    _second_prefix = (None, '')
+    
+    def _timestamp(self, record: logging.LogRecord) -> str:
+        """UTC ISO-8601 time the record was created, to the millisecond"""
+        second = int(record.created)
+        cached_second, prefix = self._second_prefix
+        if second != cached_second:
+            prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+            self._second_prefix = (second, prefix)
+        return f"{prefix}.{int(record.msecs):03d}Z"
+    
     def format(self, record: logging.LogRecord) -> str:
+        return self.format_bytes(record).decode()
+    
+    def format_bytes(self, record: logging.LogRecord) -> bytes:
+        """Serialize the record straight to UTF-8 JSON bytes"""
         log_data = {
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': self._timestamp(record),
             'level': record.levelname,
             'logger': record.name,
             'message': record.getMessage(),
@@ -73,22 +132,125 @@ class JSONFormatter(logging.Formatter):
         
         # Add exception info if present
         if record.exc_info:
-            log_data['exception'] = self.formatException(record.exc_info)
+            log_data['exception'] = _format_exception(self, record.exc_info)
+        elif record.exc_text:
+            log_data['exception'] = record.exc_text
         
         # Add extra context
-        if hasattr(record, 'context'):
-            log_data['context'] = record.context
-        
-        if hasattr(record, 'user_email'):
-            log_data['user'] = record.user_email
-        
-        if hasattr(record, 'request_id'):
-            log_data['request_id'] = record.request_id
-        
-        if hasattr(record, 'duration_ms'):
-            log_data['duration_ms'] = record.duration_ms
+        for attr, key in _EXTRA_FIELDS:
+            value = getattr(record, attr, _MISSING)
+            if value is not _MISSING:
+                log_data[key] = value
         
-        return json.dumps(log_data)
+        # orjson is several times faster than json on this per-record path;
+        # default=str keeps an odd context value from dropping the record
+        return orjson.dumps(log_data, default=str)
+
+
+class JSONBytesHandler(logging.StreamHandler):
+    """
+    Stream handler that writes JSONFormatter output as bytes
+    
+    Skips the str round trip of StreamHandler and coalesces writes in a
+    buffered binary stream instead of flushing once per record. emit() flushes
+    on errors and when LOG_FLUSH_INTERVAL has passed during a steady stream;
+    LogQueueListener flushes whenever the queue drains, so nothing sits in the
+    buffer while the server is idle. Only use it behind that listener.
+    """
+    
+    def __init__(self, stream, formatter: JSONFormatter, close_stream: bool = False):
+        super().__init__(stream)
+        self.setFormatter(formatter)
+        self._close_stream = close_stream
+        self._last_flush = time.monotonic()
+    
+    @classmethod
+    def for_stdout(cls, formatter: JSONFormatter) -> logging.Handler:
+        """Handler on a buffered binary view of stdout, or a plain one if stdout has no fd"""
+        try:
+            stream = open(sys.stdout.fileno(), 'wb', buffering=LOG_BUFFER_SIZE, closefd=False)
+        except (AttributeError, OSError, ValueError):
+            # stdout replaced by something without a file descriptor (e.g. test capture)
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(formatter)
+            return handler
+        sys.stdout.flush()
+        return cls(stream, formatter)
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.stream.write(self.formatter.format_bytes(record) + b'\n')
+            now = time.monotonic()
+            if record.levelno >= logging.ERROR or now - self._last_flush >= LOG_FLUSH_INTERVAL:
+                self.stream.flush()
+                self._last_flush = now
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+    
+    def close(self) -> None:
+        self.acquire()
+        try:
+            self.flush()
+            if self._close_stream:
+                self.stream.close()
+        finally:
+            self.release()
+            super().close()
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener thread
+    
+    The stock prepare() runs the full formatter on the caller's thread; this
+    one only merges the message args and renders the traceback (which can't
+    cross threads) so JSON and colored output still see them separately.
+    When the queue is full, records are dropped unless block_when_full is set.
+    """
+    
+    def __init__(self, log_queue: queue.Queue, block_when_full: bool = False):
+        super().__init__(log_queue)
+        self.block_when_full = block_when_full
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _format_exception(_exception_formatter, record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.block_when_full:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_exception_formatter = logging.Formatter()
+
+
+class LogQueueListener(logging.handlers.QueueListener):
+    """Queue listener that flushes its handlers once the queue has drained"""
+    
+    def handle(self, record: logging.LogRecord) -> None:
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
+# Background thread running the real handlers
+_log_listener: Optional[LogQueueListener] = None
+
+# Context added to every ContextLogger record by with_context()
+_log_context: ContextVar[Dict[str, Any]] = ContextVar('log_context', default={})
 
 
 class ContextLogger(logging.LoggerAdapter):
@@ -103,26 +265,49 @@ class ContextLogger(logging.LoggerAdapter):
         if 'extra' not in kwargs:
             kwargs['extra'] = {}
         kwargs['extra']['component'] = self.component
+        
+        # Context bound by with_context() in this task, unless the call passes its own
+        context = _log_context.get()
+        if context:
+            kwargs['extra'].setdefault('context', context)
         return msg, kwargs
     
-    def with_context(self, **context: Any) -> 'ContextLogger':
-        """Add context to log messages"""
-        new_extra = {**self.extra, 'context': context}
-        return ContextLogger(self.logger, self.component)
+    @contextmanager
+    def with_context(self, **context: Any) -> Iterator['ContextLogger']:
+        """
+        Add context to log messages within a block
+        
+        Usage:
+            with logger.with_context(query_id=query_id):
+                ...
+        
+        Bound per asyncio task / thread, so concurrent requests don't mix.
+        """
+        token = _log_context.set({**_log_context.get(), **context})
+        try:
+            yield self
+        finally:
+            _log_context.reset(token)
     
     def api_call(self, method: str, endpoint: str, status: int, duration_ms: float, 
                  user_email: Optional[str] = None) -> None:
         """Log API calls with metrics"""
+        # Normal requests log at INFO; skip building the record when that's off
+        if status < 400 and duration_ms <= 3000 and not self.isEnabledFor(logging.INFO):
+            return
+        
+        # Round once: the number goes in the record, the message reuses it
+        duration_ms = round(duration_ms, 2)
         extra = {
             'method': method,
             'endpoint': endpoint,
             'status': status,
-            'duration_ms': round(duration_ms, 2),
+            'duration_ms': duration_ms,
         }
         if user_email:
             extra['user_email'] = user_email
         
-        msg = f"{method} {endpoint} - {status} ({duration_ms:.0f}ms)"
+        msg = f"{method} {endpoint} - {status} ({duration_ms}ms)"
         
         if status >= 500:
             self.error(msg, extra=extra)
@@ -136,15 +321,19 @@ class ContextLogger(logging.LoggerAdapter):
     def query_executed(self, query_type: str, duration_ms: float, 
                       rows: Optional[int] = None, **context: Any) -> None:
         """Log database query execution"""
+        if duration_ms <= 5000 and not self.isEnabledFor(logging.INFO):
+            return
+        
+        duration_ms = round(duration_ms, 2)
         extra = {
             'query_type': query_type,
-            'duration_ms': round(duration_ms, 2),
+            'duration_ms': duration_ms,
             'context': context
         }
         if rows is not None:
             extra['rows'] = rows
         
-        msg = f"Query executed: {query_type} ({duration_ms:.0f}ms)"
+        msg = f"Query executed: {query_type} ({duration_ms}ms)"
         if rows is not None:
             msg += f" - {rows} rows"
         
@@ -155,6 +344,9 @@ class ContextLogger(logging.LoggerAdapter):
     
     def user_action(self, action: str, user_email: str, **context: Any) -> None:
         """Log user actions"""
+        if not self.isEnabledFor(logging.INFO):
+            return
+        
         extra = {
             'action': action,
             'user_email': user_email,
@@ -196,22 +388,42 @@ def setup_logging(
         )
     
     # Setup console handler
-    console_handler = logging.StreamHandler(sys.stdout)
+    if format_type == 'json':
+        console_handler = JSONBytesHandler.for_stdout(formatter)
+    else:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(formatter)
     console_handler.setLevel(log_level)
-    console_handler.setFormatter(formatter)
     
-    # Setup root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(log_level)
-    root_logger.handlers.clear()  # Remove existing handlers
-    root_logger.addHandler(console_handler)
+    handlers = [console_handler]
     
     # Setup file handler if specified
     if log_file:
-        file_handler = logging.FileHandler(log_file)
+        # Always use JSON for files
+        file_handler = JSONBytesHandler(
+            open(log_file, 'ab', buffering=LOG_BUFFER_SIZE), JSONFormatter(), close_stream=True
+        )
         file_handler.setLevel(log_level)
-        file_handler.setFormatter(JSONFormatter())  # Always use JSON for files
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
+    
+    # Format and write on a background thread so request handlers never wait
+    # on log I/O. Development blocks when the queue is full, production drops.
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+    else:
+        atexit.register(_stop_log_listener)
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _log_listener = LogQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    
+    # Setup root logger
+    root_logger = logging.getLogger()
+    root_logger.setLevel(log_level)
+    root_logger.handlers.clear()  # Remove existing handlers
+    root_logger.addHandler(
+        LogQueueHandler(log_queue, block_when_full=os.getenv('ENVIRONMENT', 'development') == 'development')
+    )
     
     # Reduce noise from external libraries
     logging.getLogger('urllib3').setLevel(logging.WARNING)
@@ -223,6 +435,12 @@ def setup_logging(
     logger.info(f"Logging configured: level={level}, format={format_type}")
 
 
+def _stop_log_listener() -> None:
+    """Drain queued records at interpreter exit"""
+    if _log_listener is not None:
+        _log_listener.stop()
+
+
 def get_logger(name: str) -> ContextLogger:
     """
     Get a logger for a specific component
@@ -247,52 +465,49 @@ def log_performance(logger: ContextLogger):
             ...
     """
     def decorator(func):
-        @wraps(func)
-        async def async_wrapper(*args, **kwargs):
-            start_time = time.time()
-            try:
-                result = await func(*args, **kwargs)
-                duration_ms = (time.time() - start_time) * 1000
+        def log_completed(start_time: float) -> None:
+            if logger.isEnabledFor(logging.INFO):
+                duration_ms = (time.perf_counter() - start_time) * 1000
                 logger.info(
                     f"Function {func.__name__} completed",
                     extra={'duration_ms': round(duration_ms, 2)}
                 )
+        
+        def log_failed(start_time: float) -> None:
+            duration_ms = (time.perf_counter() - start_time) * 1000
+            logger.error(
+                f"Function {func.__name__} failed",
+                exc_info=True,
+                extra={'duration_ms': round(duration_ms, 2)}
+            )
+        
+        # Pick the wrapper once, at decoration time
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start_time = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception:
+                    log_failed(start_time)
+                    raise
+                log_completed(start_time)
                 return result
-            except Exception as e:
-                duration_ms = (time.time() - start_time) * 1000
-                logger.error(
-                    f"Function {func.__name__} failed",
-                    exc_info=True,
-                    extra={'duration_ms': round(duration_ms, 2)}
-                )
-                raise
+            
+            return async_wrapper
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             try:
                 result = func(*args, **kwargs)
-                duration_ms = (time.time() - start_time) * 1000
-                logger.info(
-                    f"Function {func.__name__} completed",
-                    extra={'duration_ms': round(duration_ms, 2)}
-                )
-                return result
-            except Exception as e:
-                duration_ms = (time.time() - start_time) * 1000
-                logger.error(
-                    f"Function {func.__name__} failed",
-                    exc_info=True,
-                    extra={'duration_ms': round(duration_ms, 2)}
-                )
+            except Exception:
+                log_failed(start_time)
                 raise
+            log_completed(start_time)
+            return result
         
-        # Return appropriate wrapper based on function type
-        import asyncio
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
+        return sync_wrapper
     
     return decorator
 
@@ -301,6 +516,8 @@ def log_performance(logger: ContextLogger):
 class LogTimer:
     """Context manager for timing operations"""
     
+    __slots__ = ('logger', 'operation', 'context', 'start_time')
+    
     def __init__(self, logger: ContextLogger, operation: str, **context):
         self.logger = logger
         self.operation = operation
@@ -308,12 +525,16 @@ class LogTimer:
         self.start_time = None
     
     def __enter__(self):
-        self.start_time = time.time()
-        self.logger.debug(f"Starting: {self.operation}", extra={'context': self.context})
+        self.start_time = time.perf_counter()
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Starting: {self.operation}", extra={'context': self.context})
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        duration_ms = (time.time() - self.start_time) * 1000
+        duration_ms = (time.perf_counter() - self.start_time) * 1000
+        if exc_type is None and duration_ms <= 1000 and not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        
         extra = {'duration_ms': round(duration_ms, 2), 'context': self.context}
         
         if exc_type is not None:
@@ -3,16 +3,46 @@ Permissions Service for Unity Catalog Grant Checks
 Validates user permissions and enforces row-level security
 """
 
-from typing import Optional, List, Dict, Any, Set
+from typing import Optional, List, Dict, Any, Set, FrozenSet
 from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.catalog import PermissionsChange, Privilege, SecurableType
+from databricks.sdk.service.catalog import SecurableType
 from auth_middleware import UserContext
-from user_context import DataAccessScope, AccessLevel
+from user_context import ALLOW_ALL_SCOPE, DataAccessScope, AccessLevel
 import logging
-from functools import lru_cache
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from cachetools import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Simple regex to find table references
+# Pattern: FROM/JOIN <catalog>.<schema>.<table> or <schema>.<table>
+_TABLE_REF_RE = re.compile(r'(?:FROM|JOIN)\s+([a-zA-Z0-9_]+(?:\.[a-zA-Z0-9_]+){1,2})', re.IGNORECASE)
+
+# WHERE keyword in any case, as a whole word
+_WHERE_RE = re.compile(r'\bWHERE\b', re.IGNORECASE)
+
+# Worker threads for Unity Catalog grant checks when building a user's data
+# scope, shared across requests so threads aren't spun up per call
+SCOPE_CHECK_CONCURRENCY = int(os.getenv("SCOPE_CHECK_CONCURRENCY", "16"))
+_scope_executor = ThreadPoolExecutor(max_workers=SCOPE_CHECK_CONCURRENCY, thread_name_prefix="scope")
+
+
+@dataclass(frozen=True, slots=True)
+class AuditRecord:
+    """Access attempt, logged for the audit trail"""
+    timestamp: float
+    user_email: str
+    user_id: str
+    resource: str
+    action: str
+    granted: bool
+    groups: List[str]
+
 
 class PermissionsService:
     """
@@ -21,7 +51,51 @@ class PermissionsService:
     
     def __init__(self, workspace_client: WorkspaceClient):
         self.client = workspace_client
-        self._permission_cache: Dict[str, Dict[str, bool]] = {}
+        # Effective privileges keyed by (email, securable type, full name).
+        # Checks run on the SDK thread pool, hence the lock.
+        self._permission_cache: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+        self._cache_lock = threading.Lock()
+    
+    def _get_cached(self, key: tuple) -> Optional[FrozenSet[str]]:
+        """Get cached effective privileges"""
+        with self._cache_lock:
+            return self._permission_cache.get(key)
+    
+    def _set_cached(self, key: tuple, privileges: FrozenSet[str]):
+        """Cache effective privileges"""
+        with self._cache_lock:
+            self._permission_cache[key] = privileges
+    
+    def _effective_privileges(
+        self,
+        user_context: UserContext,
+        securable_type: SecurableType,
+        full_name: str
+    ) -> FrozenSet[str]:
+        """
+        Privileges the user effectively holds on a securable
+        
+        Cached per securable rather than per privilege, so checking USAGE and
+        then SELECT on the same object is one REST call.
+        """
+        cache_key = (user_context.email, securable_type, full_name)
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            return cached
+        
+        grants = user_context.workspace_client.grants.get_effective(
+            securable_type=securable_type,
+            full_name=full_name,
+            principal=user_context.email
+        )
+        privileges = frozenset(
+            effective.privilege.value
+            for assignment in grants.privilege_assignments or []
+            for effective in assignment.privileges or []
+            if effective.privilege is not None
+        )
+        self._set_cached(cache_key, privileges)
+        return privileges
     
     def check_catalog_access(
         self,
@@ -44,41 +118,19 @@ class PermissionsService:
         if user_context.is_admin:
             return True
         
-        cache_key = f"{user_context.email}:{catalog_name}:{required_privilege}"
-        if cache_key in self._permission_cache.get(user_context.email, {}):
-            return self._permission_cache[user_context.email][cache_key]
+        # Nothing to check grants with
+        if not user_context.workspace_client:
+            return False
         
         try:
-            # Use user's workspace client to check permissions
-            if user_context.workspace_client:
-                # Try to get catalog info - will fail if no access
-                catalog = user_context.workspace_client.catalogs.get(catalog_name)
-                
-                # Check effective permissions
-                grants = user_context.workspace_client.grants.get_effective(
-                    securable_type=SecurableType.CATALOG,
-                    full_name=catalog_name,
-                    principal=user_context.email
-                )
-                
-                # Check if user has required privilege
-                has_access = any(
-                    grant.privilege.value == required_privilege
-                    for grant in grants.privilege_assignments or []
-                )
-                
-                # Cache result
-                if user_context.email not in self._permission_cache:
-                    self._permission_cache[user_context.email] = {}
-                self._permission_cache[user_context.email][cache_key] = has_access
-                
-                return has_access
-                
+            # Fails for catalogs the user can't see
+            return required_privilege in self._effective_privileges(
+                user_context, SecurableType.CATALOG, catalog_name
+            )
+        
         except Exception as e:
             logger.warning(f"Permission check failed for {user_context.email} on catalog {catalog_name}: {str(e)}")
             return False
-        
-        return False
     
     def check_schema_access(
         self,
@@ -91,41 +143,31 @@ class PermissionsService:
         if user_context.is_admin:
             return True
         
+        if not user_context.workspace_client:
+            return False
+        
         # First check catalog access
         if not self.check_catalog_access(user_context, catalog_name, "USAGE"):
             return False
         
-        full_name = f"{catalog_name}.{schema_name}"
-        cache_key = f"{user_context.email}:{full_name}:{required_privilege}"
-        
-        if cache_key in self._permission_cache.get(user_context.email, {}):
-            return self._permission_cache[user_context.email][cache_key]
-        
+        return self._check_schema_access_unchecked(user_context, catalog_name, schema_name, required_privilege)
+    
+    def _check_schema_access_unchecked(
+        self,
+        user_context: UserContext,
+        catalog_name: str,
+        schema_name: str,
+        required_privilege: str
+    ) -> bool:
+        """Check schema grants for a user whose catalog USAGE is already verified"""
         try:
-            if user_context.workspace_client:
-                # Get schema grants
-                grants = user_context.workspace_client.grants.get_effective(
-                    securable_type=SecurableType.SCHEMA,
-                    full_name=full_name,
-                    principal=user_context.email
-                )
-                
-                has_access = any(
-                    grant.privilege.value == required_privilege
-                    for grant in grants.privilege_assignments or []
-                )
-                
-                if user_context.email not in self._permission_cache:
-                    self._permission_cache[user_context.email] = {}
-                self._permission_cache[user_context.email][cache_key] = has_access
-                
-                return has_access
-                
+            return required_privilege in self._effective_privileges(
+                user_context, SecurableType.SCHEMA, f"{catalog_name}.{schema_name}"
+            )
+        
         except Exception as e:
             logger.warning(f"Schema permission check failed: {str(e)}")
             return False
-        
-        return False
     
     def check_table_access(
         self,
@@ -139,55 +181,32 @@ class PermissionsService:
         if user_context.is_admin:
             return True
         
+        if not user_context.workspace_client:
+            return False
+        
         # Check parent schema access
         if not self.check_schema_access(user_context, catalog_name, schema_name, "USAGE"):
             return False
         
-        full_name = f"{catalog_name}.{schema_name}.{table_name}"
-        cache_key = f"{user_context.email}:{full_name}:{required_privilege}"
-        
-        if cache_key in self._permission_cache.get(user_context.email, {}):
-            return self._permission_cache[user_context.email][cache_key]
-        
         try:
-            if user_context.workspace_client:
-                # Get table grants
-                grants = user_context.workspace_client.grants.get_effective(
-                    securable_type=SecurableType.TABLE,
-                    full_name=full_name,
-                    principal=user_context.email
-                )
-                
-                has_access = any(
-                    grant.privilege.value == required_privilege
-                    for grant in grants.privilege_assignments or []
-                )
-                
-                if user_context.email not in self._permission_cache:
-                    self._permission_cache[user_context.email] = {}
-                self._permission_cache[user_context.email][cache_key] = has_access
-                
-                return has_access
-                
+            return required_privilege in self._effective_privileges(
+                user_context, SecurableType.TABLE, f"{catalog_name}.{schema_name}.{table_name}"
+            )
+        
         except Exception as e:
             logger.warning(f"Table permission check failed: {str(e)}")
             return False
-        
-        return False
     
     def get_user_data_scope(self, user_context: UserContext) -> DataAccessScope:
         """
         Get comprehensive data access scope for user
         This includes all catalogs, schemas, and tables they can access
         """
-        scope = DataAccessScope()
-        
         # Admins get full access
         if user_context.is_admin:
-            scope.accessible_catalogs.add("*")
-            scope.accessible_schemas.add("*.*")
-            scope.accessible_tables.add("*.*.*")
-            return scope
+            return ALLOW_ALL_SCOPE
+        
+        scope = DataAccessScope()
         
         try:
             if not user_context.workspace_client:
@@ -195,22 +214,46 @@ class PermissionsService:
             
             # Get all catalogs user can access
             try:
-                catalogs = user_context.workspace_client.catalogs.list()
-                for catalog in catalogs:
-                    if self.check_catalog_access(user_context, catalog.name, "USAGE"):
-                        scope.accessible_catalogs.add(catalog.name)
-                        
-                        # Get schemas in this catalog
-                        try:
-                            schemas = user_context.workspace_client.schemas.list(catalog_name=catalog.name)
-                            for schema in schemas:
-                                if self.check_schema_access(user_context, catalog.name, schema.name, "USAGE"):
-                                    scope.accessible_schemas.add(f"{catalog.name}.{schema.name}")
-                        except Exception as e:
-                            logger.debug(f"Could not list schemas in {catalog.name}: {str(e)}")
-            
+                catalog_names = [catalog.name for catalog in user_context.workspace_client.catalogs.list()]
             except Exception as e:
                 logger.warning(f"Could not list catalogs for {user_context.email}: {str(e)}")
+                return scope
+            
+            def list_schema_names(catalog_name: str) -> List[str]:
+                try:
+                    return [
+                        schema.name
+                        for schema in user_context.workspace_client.schemas.list(catalog_name=catalog_name)
+                    ]
+                except Exception as e:
+                    logger.debug(f"Could not list schemas in {catalog_name}: {str(e)}")
+                    return []
+            
+            # Each check is a REST round trip, so fan them out: catalogs, then
+            # schema listings for accessible catalogs, then schema checks
+            # (catalog USAGE is already known there, so it isn't rechecked)
+            catalog_access = _scope_executor.map(
+                lambda name: self.check_catalog_access(user_context, name, "USAGE"),
+                catalog_names
+            )
+            accessible = [name for name, ok in zip(catalog_names, catalog_access) if ok]
+            scope.accessible_catalogs.update(accessible)
+            
+            candidates = [
+                (catalog_name, schema_name)
+                for catalog_name, schema_names in zip(accessible, _scope_executor.map(list_schema_names, accessible))
+                for schema_name in schema_names
+            ]
+            schema_access = _scope_executor.map(
+                lambda pair: self._check_schema_access_unchecked(user_context, pair[0], pair[1], "USAGE"),
+                candidates
+            )
+            scope.accessible_schemas.update(
+                f"{catalog_name}.{schema_name}"
+                for (catalog_name, schema_name), ok in zip(candidates, schema_access)
+                if ok
+            )
+            scope.refresh_index()
         
         except Exception as e:
             logger.error(f"Error building data scope: {str(e)}")
@@ -243,9 +286,10 @@ class PermissionsService:
             # Add a WHERE clause that uses current_user() for basic RLS
             # This assumes tables have a 'owner_email' or similar column
             # In practice, you'd configure this per table
-            if "WHERE" in sql.upper():
+            if _WHERE_RE.search(sql):
                 # Already has WHERE, add AND condition
-                sql = sql.replace("WHERE", f"WHERE current_user() = '{user_context.email}' AND")
+                condition = f" current_user() = '{user_context.email}' AND"
+                sql = _WHERE_RE.sub(lambda match: match.group(0) + condition, sql)
             else:
                 # No WHERE clause, need to add one carefully
                 # This is simplified - production would use SQL parser
@@ -293,21 +337,16 @@ class PermissionsService:
         Extract table references from SQL query
         This is a simplified version - production should use SQL parser
         """
-        import re
-        
-        # Simple regex to find table references
-        # Pattern: FROM/JOIN <catalog>.<schema>.<table> or <schema>.<table>
-        pattern = r'(?:FROM|JOIN)\s+([a-zA-Z0-9_]+(?:\.[a-zA-Z0-9_]+){1,2})'
-        matches = re.findall(pattern, sql, re.IGNORECASE)
-        
-        return matches
+        return _TABLE_REF_RE.findall(sql)
     
     def clear_cache(self, user_email: Optional[str] = None):
         """Clear permission cache"""
-        if user_email:
-            self._permission_cache.pop(user_email, None)
-        else:
-            self._permission_cache.clear()
+        with self._cache_lock:
+            if user_email:
+                for key in [key for key in self._permission_cache if key[0] == user_email]:
+                    self._permission_cache.pop(key, None)
+            else:
+                self._permission_cache.clear()
     
     def audit_log_access(
         self,
@@ -325,29 +364,43 @@ class PermissionsService:
             action: Action being performed
             granted: Whether access was granted
         """
-        log_entry = {
-            "timestamp": None,  # Would use proper timestamp
-            "user_email": user_context.email,
-            "user_id": user_context.user_id,
-            "resource": resource,
-            "action": action,
-            "granted": granted,
-            "groups": user_context.groups
-        }
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        
+        record = AuditRecord(
+            timestamp=time.time(),
+            user_email=user_context.email,
+            user_id=user_context.user_id,
+            resource=resource,
+            action=action,
+            granted=granted,
+            groups=user_context.groups
+        )
         
-        # In production, write to audit log table or service
-        logger.info(f"Access audit: {log_entry}")
+        # In production, write to audit log table or service. The record goes
+        # out as structured fields (orjson serializes dataclasses natively);
+        # the message args are only formatted if emitted.
+        logger.info(
+            "Access audit: %s %s %s for %s",
+            action, resource, "granted" if granted else "denied", user_context.email,
+            extra={'audit': record}
+        )
 
 
 # Global instance
 _permissions_service: Optional[PermissionsService] = None
+_permissions_service_lock = threading.Lock()
 
 
 def get_permissions_service(workspace_client: WorkspaceClient) -> PermissionsService:
     """Get or create global permissions service instance"""
     global _permissions_service
-    if _permissions_service is None:
-        _permissions_service = PermissionsService(workspace_client)
+    if _permissions_service is not None:
+        return _permissions_service
+    
+    with _permissions_service_lock:
+        if _permissions_service is None:
+            _permissions_service = PermissionsService(workspace_client)
     return _permissions_service
 
 
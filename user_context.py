@@ -3,10 +3,28 @@ User Context and Session Management
 Handles user identity and data access scope
 """
 
+import orjson
+import secrets
+import sys
+import time
 from typing import Optional, Set, Dict, Any
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
+
+# Group names (lowercase) that grant each role
+_ADMIN_GROUPS = frozenset({"admins", "workspace admins", "account admins", "dashboard_admins"})
+_ANALYST_GROUPS = frozenset({"analysts", "data_analysts", "analytics_team"})
+
+# Session roles for each (is_admin, is_analyst, is_viewer) outcome of
+# determine_user_roles; admins are always analysts, analysts always viewers
+_SESSION_ROLES: Dict[tuple, tuple] = {
+    (True, True, True): ("dashboard_admin", "query_admin", "filter_admin", "analyst", "viewer"),
+    (False, True, True): ("analyst", "viewer"),
+    (False, False, True): ("viewer",),
+    (False, False, False): (),
+}
 
 
 class AccessLevel(Enum):
@@ -17,7 +35,7 @@ class AccessLevel(Enum):
     ADMIN = "admin"
 
 
-@dataclass
+@dataclass(slots=True)
 class DataAccessScope:
     """
     Defines what data a user can access
@@ -33,55 +51,148 @@ class DataAccessScope:
     # Tables user has access to (format: "catalog.schema.table")
     accessible_tables: Set[str] = field(default_factory=set)
     
+    # Row-level filters, column restrictions and access levels are rarely set,
+    # so they stay None (no dict allocated) until the first set_* call
+    
     # Row-level filters to apply (table_name -> filter_expression)
-    row_level_filters: Dict[str, str] = field(default_factory=dict)
+    row_level_filters: Optional[Dict[str, str]] = None
     
     # Column-level restrictions (table_name -> set of restricted columns)
-    restricted_columns: Dict[str, Set[str]] = field(default_factory=dict)
+    restricted_columns: Optional[Dict[str, Set[str]]] = None
     
     # Access level per resource
-    access_levels: Dict[str, AccessLevel] = field(default_factory=dict)
+    access_levels: Optional[Dict[str, AccessLevel]] = None
+    
+    # Lookup trees built by refresh_index()
+    _all_catalogs: bool = field(default=False, init=False, repr=False, compare=False)
+    _schema_tree: Optional[Dict[str, Set[str]]] = field(default=None, init=False, repr=False, compare=False)
+    _table_tree: Optional[Dict[str, Dict[str, Set[str]]]] = field(default=None, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.refresh_index()
+    
+    def refresh_index(self):
+        """
+        Build the lookup trees for the can_access_* checks
+        
+        Schemas become catalog -> {schema} and tables catalog -> schema -> {table},
+        with "*" at any level matching every name there. Runs on construction;
+        call again after changing accessible_* in place.
+        """
+        self._all_catalogs = "*" in self.accessible_catalogs
+        
+        self._schema_tree = {}
+        for name in self.accessible_schemas:
+            catalog, _, schema = name.partition(".")
+            self._schema_tree.setdefault(catalog, set()).add(schema)
+        
+        self._table_tree = {}
+        for name in self.accessible_tables:
+            catalog, _, rest = name.partition(".")
+            schema, _, table = rest.partition(".")
+            self._table_tree.setdefault(catalog, {}).setdefault(schema, set()).add(table)
     
     def can_access_catalog(self, catalog: str) -> bool:
         """Check if user can access a catalog"""
-        return catalog in self.accessible_catalogs or "*" in self.accessible_catalogs
+        return self._all_catalogs or catalog in self.accessible_catalogs
     
     def can_access_schema(self, catalog: str, schema: str) -> bool:
         """Check if user can access a schema"""
-        full_name = f"{catalog}.{schema}"
-        return (
-            full_name in self.accessible_schemas or
-            f"{catalog}.*" in self.accessible_schemas or
-            "*.*" in self.accessible_schemas
-        )
+        for schemas in (self._schema_tree.get(catalog), self._schema_tree.get("*")):
+            if schemas and (schema in schemas or "*" in schemas):
+                return True
+        return False
     
     def can_access_table(self, catalog: str, schema: str, table: str) -> bool:
         """Check if user can access a table"""
-        full_name = f"{catalog}.{schema}.{table}"
-        return (
-            full_name in self.accessible_tables or
-            f"{catalog}.{schema}.*" in self.accessible_tables or
-            f"{catalog}.*.*" in self.accessible_tables or
-            "*.*.*" in self.accessible_tables
-        )
+        for schemas in (self._table_tree.get(catalog), self._table_tree.get("*")):
+            if not schemas:
+                continue
+            for tables in (schemas.get(schema), schemas.get("*")):
+                if tables and (table in tables or "*" in tables):
+                    return True
+        return False
+    
+    def can_access_table_fqn(self, full_name: str) -> bool:
+        """Check if user can access a table given by its full catalog.schema.table name"""
+        catalog, _, rest = full_name.partition(".")
+        schema, _, table = rest.partition(".")
+        return self.can_access_table(catalog, schema, table)
+    
+    def set_row_filter(self, table: str, filter_expression: str):
+        """Set the row-level filter for a table"""
+        if self.row_level_filters is None:
+            self.row_level_filters = {}
+        self.row_level_filters[table] = filter_expression
+    
+    def set_restricted_columns(self, table: str, columns: Set[str]):
+        """Set the restricted columns for a table"""
+        if self.restricted_columns is None:
+            self.restricted_columns = {}
+        self.restricted_columns[table] = columns
+    
+    def set_access_level(self, resource: str, level: AccessLevel):
+        """Set the access level for a resource"""
+        if self.access_levels is None:
+            self.access_levels = {}
+        self.access_levels[resource] = level
     
     def get_row_filter(self, table: str) -> Optional[str]:
         """Get row-level filter for a table"""
+        if not self.row_level_filters:
+            return None
         return self.row_level_filters.get(table)
     
     def get_restricted_columns(self, table: str) -> Set[str]:
         """Get restricted columns for a table"""
+        if not self.restricted_columns:
+            return set()
         return self.restricted_columns.get(table, set())
     
     def get_access_level(self, resource: str) -> AccessLevel:
         """Get access level for a resource"""
+        if not self.access_levels:
+            return AccessLevel.NONE
         return self.access_levels.get(resource, AccessLevel.NONE)
 
 
-@dataclass
+
+class _AllowAllScope(DataAccessScope):
+    """Scope for admins: every access check passes without any lookups"""
+    
+    __slots__ = ()
+    
+    def can_access_catalog(self, catalog: str) -> bool:
+        return True
+    
+    def can_access_schema(self, catalog: str, schema: str) -> bool:
+        return True
+    
+    def can_access_table(self, catalog: str, schema: str, table: str) -> bool:
+        return True
+    
+    def can_access_table_fqn(self, full_name: str) -> bool:
+        return True
+    
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("The shared allow-all scope is read-only")
+    
+    set_row_filter = set_restricted_columns = set_access_level = _read_only
+
+
+# Shared by all admin sessions; frozensets keep it from being modified in place
+ALLOW_ALL_SCOPE = _AllowAllScope(
+    accessible_catalogs=frozenset({"*"}),
+    accessible_schemas=frozenset({"*.*"}),
+    accessible_tables=frozenset({"*.*.*"})
+)
+
+@dataclass(slots=True, eq=False)
 class UserSession:
     """
     Complete user session information including identity and access scope
+    
+    Sessions compare by identity (eq=False); each has its own session_id.
     """
     
     # User identity
@@ -111,23 +222,54 @@ class UserSession:
     ip_address: Optional[str] = None
     user_agent: Optional[str] = None
     
+    # Set views of roles and groups for membership checks; both are fixed
+    # for the life of the session
+    _roles_set: frozenset = field(default=frozenset(), init=False, repr=False)
+    _groups_set: frozenset = field(default=frozenset(), init=False, repr=False)
+    
+    # ISO strings for to_dict(); last activity is refreshed by update_activity()
+    _created_at_iso: str = field(default="", init=False, repr=False)
+    _last_activity_iso: str = field(default="", init=False, repr=False)
+    
+    # to_dict() contents; identity and role fields are fixed for the session
+    _api_dict_cache: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False)
+    
+    # Monotonic-clock deadline for expires_at, and the value it came from
+    _expiry_deadline: float = field(default=0.0, init=False, repr=False)
+    _expiry_source: Optional[datetime] = field(default=None, init=False, repr=False)
+    
+    def __post_init__(self):
+        self._roles_set = frozenset(self.roles)
+        self._groups_set = frozenset(self.groups)
+        self._created_at_iso = self.created_at.isoformat()
+        self._last_activity_iso = self.last_activity.isoformat()
+    
     def update_activity(self):
         """Update last activity timestamp"""
         self.last_activity = datetime.utcnow()
+        self._last_activity_iso = self.last_activity.isoformat()
+        if self._api_dict_cache is not None:
+            self._api_dict_cache["last_activity"] = self._last_activity_iso
     
     def is_expired(self) -> bool:
         """Check if session has expired"""
         if not self.expires_at:
             return False
-        return datetime.utcnow() > self.expires_at
+        
+        # Convert expires_at to a monotonic deadline once (and again if it's
+        # reassigned), so each check is a float compare
+        if self.expires_at is not self._expiry_source:
+            self._expiry_source = self.expires_at
+            self._expiry_deadline = time.monotonic() + (self.expires_at - datetime.utcnow()).total_seconds()
+        return time.monotonic() > self._expiry_deadline
     
     def has_role(self, role: str) -> bool:
         """Check if user has a specific role"""
-        return role in self.roles or self.is_admin
+        return self.is_admin or role in self._roles_set
     
     def has_group(self, group: str) -> bool:
         """Check if user belongs to a group"""
-        return group in self.groups or self.is_admin
+        return self.is_admin or group in self._groups_set
     
     def can_access_admin_panel(self) -> bool:
         """Check if user can access admin panel"""
@@ -145,21 +287,31 @@ class UserSession:
         """Check if user can view analytics"""
         return self.is_admin or self.is_analyst or self.is_viewer
     
+    def _api_dict(self) -> Dict[str, Any]:
+        """API representation, built once; update_activity() keeps it current"""
+        if self._api_dict_cache is None:
+            self._api_dict_cache = {
+                "email": self.email,
+                "user_id": self.user_id,
+                "display_name": self.display_name,
+                "groups": self.groups,
+                "roles": self.roles,
+                "is_admin": self.is_admin,
+                "is_analyst": self.is_analyst,
+                "is_viewer": self.is_viewer,
+                "session_id": self.session_id,
+                "created_at": self._created_at_iso,
+                "last_activity": self._last_activity_iso,
+            }
+        return self._api_dict_cache
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for API responses"""
-        return {
-            "email": self.email,
-            "user_id": self.user_id,
-            "display_name": self.display_name,
-            "groups": self.groups,
-            "roles": self.roles,
-            "is_admin": self.is_admin,
-            "is_analyst": self.is_analyst,
-            "is_viewer": self.is_viewer,
-            "session_id": self.session_id,
-            "created_at": self.created_at.isoformat(),
-            "last_activity": self.last_activity.isoformat(),
-        }
+        return self._api_dict().copy()
+    
+    def to_json_bytes(self) -> bytes:
+        """Serialize to_dict() straight to JSON bytes"""
+        return orjson.dumps(self._api_dict())
     
     def to_audit_log(self) -> Dict[str, Any]:
         """Convert to audit log format"""
@@ -180,19 +332,16 @@ def determine_user_roles(groups: list[str]) -> tuple[bool, bool, bool]:
     Returns:
         (is_admin, is_analyst, is_viewer)
     """
-    groups_lower = [g.lower() for g in groups]
-    
-    is_admin = any(
-        admin_group in groups_lower
-        for admin_group in ["admins", "workspace admins", "account admins", "dashboard_admins"]
-    )
-    
-    is_analyst = any(
-        analyst_group in groups_lower
-        for analyst_group in ["analysts", "data_analysts", "analytics_team"]
-    ) or is_admin
+    return _roles_for_groups(frozenset(g.lower() for g in groups))
+
+
+@lru_cache(maxsize=4096)
+def _roles_for_groups(groups_lower: frozenset) -> tuple[bool, bool, bool]:
+    """Roles for a lowercased group set; many users share the same set"""
+    is_admin = not _ADMIN_GROUPS.isdisjoint(groups_lower)
+    is_analyst = is_admin or not _ANALYST_GROUPS.isdisjoint(groups_lower)
     
-    is_viewer = len(groups) > 0 or is_analyst or is_admin
+    is_viewer = len(groups_lower) > 0 or is_analyst or is_admin
     
     return is_admin, is_analyst, is_viewer
 
@@ -210,18 +359,15 @@ def create_user_session(
     """
     is_admin, is_analyst, is_viewer = determine_user_roles(groups)
     
-    # Generate session ID
-    import uuid
-    session_id = str(uuid.uuid4())
+    # Group names repeat across every session; share one copy of each. Role
+    # names below are source literals, which CPython already interns.
+    groups = [sys.intern(group) for group in groups]
+    
+    # Generate session ID (192 random bits, URL-safe)
+    session_id = secrets.token_urlsafe(24)
     
     # Determine roles from groups
-    roles = []
-    if is_admin:
-        roles.extend(["dashboard_admin", "query_admin", "filter_admin"])
-    if is_analyst:
-        roles.append("analyst")
-    if is_viewer:
-        roles.append("viewer")
+    roles = list(_SESSION_ROLES[is_admin, is_analyst, is_viewer])
     
     return UserSession(
         email=email,
@@ -232,6 +378,7 @@ def create_user_session(
         is_admin=is_admin,
         is_analyst=is_analyst,
         is_viewer=is_viewer,
+        data_scope=ALLOW_ALL_SCOPE if is_admin else DataAccessScope(),
         session_id=session_id,
         ip_address=ip_address,
         user_agent=user_agent